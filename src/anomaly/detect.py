@@ -1,5 +1,37 @@
 import pandas as pd
 import numpy as np
+import sys
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.constants import CATEGORICAL_COLUMNS
+
+
+def _numeric_amounts(df: pd.DataFrame, value_col: str = "claim_amount") -> np.ndarray:
+    """Cast a value column to a float64 ndarray, invalid values become NaN."""
+    values = pd.to_numeric(df[value_col], errors="coerce")
+    return values.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _zscore_by_group(amounts: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """
+    Compute z-scores of a float ndarray grouped by an aligned key array.
+    
+    Categorical keys are grouped on their integer codes.
+    """
+    # Group statistics aligned back to the original rows
+    grouped = pd.Series(amounts).groupby(keys, sort=False, observed=True)
+    means = grouped.transform("mean").to_numpy()
+    stds = grouped.transform("std").to_numpy()
+    
+    # Handle cases where std is 0 or NaN
+    stds[stds == 0] = np.nan
+    
+    z_scores = (amounts - means) / stds
+    z_scores[np.isnan(z_scores)] = 0
+    return z_scores
 
 
 def compute_zscore_by_group(df: pd.DataFrame, value_col: str, group_col: str) -> pd.Series:
@@ -14,54 +46,77 @@ def compute_zscore_by_group(df: pd.DataFrame, value_col: str, group_col: str) ->
     Returns:
         Series of z-scores
     """
-    values = pd.to_numeric(df[value_col], errors="coerce")
-    
-    # Compute group statistics
-    group_stats = df.groupby(group_col)[value_col].agg(["mean", "std"])
-    
-    # Map back to original dataframe
-    means = df[group_col].map(group_stats["mean"])
-    stds = df[group_col].map(group_stats["std"])
-    
-    # Handle cases where std is 0 or NaN
-    stds = stds.replace(0, np.nan)
-    
-    z_scores = (values - means) / stds
-    return z_scores.fillna(0)
+    z_scores = _zscore_by_group(_numeric_amounts(df, value_col), df[group_col].array)
+    return pd.Series(z_scores, index=df.index)
 
 
-def detect_amount_outliers_by_provider(df: pd.DataFrame, threshold: float = 3.0) -> pd.Series:
-    """Detect outliers in claim amount grouped by provider."""
-    z_scores = compute_zscore_by_group(df, "claim_amount", "provider_id")
+def detect_amount_outliers_by_provider(df: pd.DataFrame, threshold: float = 3.0, amounts: np.ndarray = None,
+                                       keys=None) -> np.ndarray:
+    """Detect outliers in claim amount grouped by provider (keys: optional precomputed provider keys)."""
+    if amounts is None:
+        amounts = _numeric_amounts(df)
+    if keys is None:
+        keys = df["provider_id"].array
+    z_scores = _zscore_by_group(amounts, keys)
     return np.abs(z_scores) > threshold
 
 
-def detect_amount_outliers_by_cpt(df: pd.DataFrame, threshold: float = 3.0) -> pd.Series:
-    """Detect outliers in claim amount grouped by CPT code."""
-    z_scores = compute_zscore_by_group(df, "claim_amount", "cpt_code")
+def detect_amount_outliers_by_cpt(df: pd.DataFrame, threshold: float = 3.0, amounts: np.ndarray = None,
+                                  keys=None) -> np.ndarray:
+    """Detect outliers in claim amount grouped by CPT code (keys: optional precomputed CPT keys)."""
+    if amounts is None:
+        amounts = _numeric_amounts(df)
+    if keys is None:
+        keys = df["cpt_code"].array
+    z_scores = _zscore_by_group(amounts, keys)
     return np.abs(z_scores) > threshold
 
 
-def detect_amount_outliers_global(df: pd.DataFrame, threshold: float = 3.0) -> pd.Series:
+def detect_amount_outliers_global(df: pd.DataFrame, threshold: float = 3.0, amounts: np.ndarray = None) -> np.ndarray:
     """Detect global outliers in claim amount using z-score."""
-    amounts = pd.to_numeric(df["claim_amount"], errors="coerce")
-    mean_amt = amounts.mean()
-    std_amt = amounts.std()
+    if amounts is None:
+        amounts = _numeric_amounts(df)
+    valid = amounts[~np.isnan(amounts)]
+    
+    # std is undefined for fewer than two values
+    if len(valid) < 2:
+        return np.zeros(len(df), dtype=bool)
     
-    if std_amt == 0 or pd.isna(std_amt):
-        return pd.Series([False] * len(df), index=df.index)
+    mean_amt = valid.mean()
+    std_amt = valid.std(ddof=1)
+    
+    if std_amt == 0:
+        return np.zeros(len(df), dtype=bool)
     
     z_scores = np.abs((amounts - mean_amt) / std_amt)
     return z_scores > threshold
 
 
-def detect_anomalies(df: pd.DataFrame, zscore_threshold: float = 3.0) -> pd.DataFrame:
+def write_anomalies_parquet(df: pd.DataFrame, output_path, row_group_size: int = 64 * 1024):
+    """
+    Write anomalies to Parquet through one ParquetWriter in fixed-size row groups.
+    
+    Repetitive string columns are written as dictionary-encoded categoricals
+    and pages are ZSTD-compressed.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    categorical = {c: "category" for c in CATEGORICAL_COLUMNS if c in df.columns}
+    table = pa.Table.from_pandas(df.astype(categorical), preserve_index=False)
+    with pq.ParquetWriter(output_path, table.schema, compression="zstd", compression_level=3,
+                          use_dictionary=True) as writer:
+        writer.write_table(table, row_group_size=row_group_size)
+
+
+def detect_anomalies(df: pd.DataFrame, zscore_threshold: float = 3.0, output_path=None) -> pd.DataFrame:
     """
     Detect anomalies using z-score analysis and combine with existing DQ flags.
     
     Args:
         df: DataFrame with claims data (may include DQ flags from run_dq)
         zscore_threshold: Z-score threshold for outlier detection
+        output_path: Optional Parquet file to write the result to
     
     Returns:
         DataFrame with is_anomalous flag and anomaly_reasons column
@@ -74,46 +129,58 @@ def detect_anomalies(df: pd.DataFrame, zscore_threshold: float = 3.0) -> pd.Data
     
     print(f"\nRunning anomaly detection on {len(df)} rows...")
     
+    # Group keys as categoricals so z-score groupbys run on integer codes; kept
+    # local so the returned columns keep their dtypes
+    group_keys = {
+        col: df[col].astype("category").array
+        for col in ("provider_id", "cpt_code") if col in df.columns
+    }
+    
+    # Cast claim_amount once and share the buffer across all z-score passes
+    amounts = _numeric_amounts(df)
+    
     # Compute z-score based outlier flags
     anomaly_flags = {}
     
     # Global amount outliers
-    anomaly_flags["zscore_global"] = detect_amount_outliers_global(df, zscore_threshold)
+    anomaly_flags["zscore_global"] = detect_amount_outliers_global(df, zscore_threshold, amounts)
     print(f"  Z-score global outliers: {anomaly_flags['zscore_global'].sum()}")
     
     # Provider-level outliers (if provider_id exists and has valid values)
     if "provider_id" in df.columns and df["provider_id"].notna().sum() > 0:
-        anomaly_flags["zscore_by_provider"] = detect_amount_outliers_by_provider(df, zscore_threshold)
+        anomaly_flags["zscore_by_provider"] = detect_amount_outliers_by_provider(
+            df, zscore_threshold, amounts, group_keys["provider_id"]
+        )
         print(f"  Z-score by provider outliers: {anomaly_flags['zscore_by_provider'].sum()}")
     
     # CPT-level outliers (if cpt_code exists and has valid values)
     if "cpt_code" in df.columns and df["cpt_code"].notna().sum() > 0:
-        anomaly_flags["zscore_by_cpt"] = detect_amount_outliers_by_cpt(df, zscore_threshold)
+        anomaly_flags["zscore_by_cpt"] = detect_amount_outliers_by_cpt(
+            df, zscore_threshold, amounts, group_keys["cpt_code"]
+        )
         print(f"  Z-score by CPT outliers: {anomaly_flags['zscore_by_cpt'].sum()}")
     
-    # Build anomaly reasons
-    def build_anomaly_reasons(row_idx):
-        reasons = []
-        
-        # Include existing DQ flags if present
-        if "flags_list" in df.columns:
-            existing_flags = df.loc[row_idx, "flags_list"]
-            if pd.notna(existing_flags) and existing_flags:
-                reasons.extend(existing_flags.split(","))
-        
-        # Add z-score flags
-        for flag_name, flag_series in anomaly_flags.items():
-            if flag_series.loc[row_idx]:
-                reasons.append(flag_name)
-        
-        return reasons
-    
-    # Apply anomaly detection
-    df["anomaly_reasons"] = df.index.map(lambda idx: build_anomaly_reasons(idx))
-    df["anomaly_reasons_str"] = df["anomaly_reasons"].apply(lambda x: ",".join(x) if x else "")
-    
-    # Determine is_anomalous
-    df["is_anomalous"] = df["anomaly_reasons"].apply(lambda x: len(x) > 0)
+    # Build anomaly reasons column-wise: one pass per flag over its True rows only.
+    # is_anomalous is the OR of the same masks, so it needs no per-row check.
+    reasons = [[] for _ in range(len(df))]
+    is_anomalous = np.zeros(len(df), dtype=bool)
+    
+    # Include existing DQ flags if present
+    if "flags_list" in df.columns:
+        flags_list = df["flags_list"].fillna("")
+        for row_reasons, flags in zip(reasons, flags_list.str.split(",")):
+            row_reasons.extend(f for f in flags if f)
+        is_anomalous |= flags_list.ne("").to_numpy()
+    
+    # Add z-score flags
+    for flag_name, flag_mask in anomaly_flags.items():
+        for i in np.flatnonzero(flag_mask):
+            reasons[i].append(flag_name)
+        is_anomalous |= flag_mask
+    
+    df["anomaly_reasons"] = reasons
+    df["anomaly_reasons_str"] = [",".join(r) for r in reasons]
+    df["is_anomalous"] = is_anomalous
     
     # Count anomalies
     total_anomalies = df["is_anomalous"].sum()
@@ -121,22 +188,19 @@ def detect_anomalies(df: pd.DataFrame, zscore_threshold: float = 3.0) -> pd.Data
     
     # Summary by anomaly type
     print("\nAnomaly breakdown:")
-    all_reasons = []
-    for reasons in df["anomaly_reasons"]:
-        all_reasons.extend(reasons)
+    reason_counts = df["anomaly_reasons"].explode().dropna().value_counts()
+    for reason, count in reason_counts.items():
+        print(f"  {reason}: {count}")
     
-    if all_reasons:
-        reason_counts = pd.Series(all_reasons).value_counts()
-        for reason, count in reason_counts.items():
-            print(f"  {reason}: {count}")
+    if output_path is not None:
+        write_anomalies_parquet(df, output_path)
+        print(f"\nAnomalies written to {output_path}")
     
     return df
 
 
 if __name__ == "__main__":
     # Test with sample data
-    import sys
-    sys.path.insert(0, ".")
     from src.dq.rules import run_dq
     
     anomalies = run_dq()
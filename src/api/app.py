@@ -3,8 +3,11 @@ from pydantic import BaseModel
 from typing import List, Optional, Any
 from pathlib import Path
 import pandas as pd
+import numpy as np
+import math
 import sys
 import os
+import threading
 
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
@@ -14,6 +17,22 @@ app = FastAPI(title="UH-DQIP API", version="0.1")
 # Global cache for anomalies DataFrame
 _anomalies_cache: Optional[pd.DataFrame] = None
 
+# claim_id -> row position in the cached DataFrame (first occurrence)
+_claim_index: Optional[dict] = None
+
+# column -> dtype kind of the cached DataFrame, used to pick per-column null checks
+_column_kinds: Optional[dict] = None
+
+# Guards loading and swapping the three cache globals above as one unit
+_cache_lock = threading.Lock()
+
+# Gold anomalies file served by the API (relative to the working directory)
+ANOMALIES_FILE = Path("data/gold") / "anomalies.parquet"
+
+# claim_id -> explanation generated on request; kept apart from the cached
+# DataFrame so concurrent readers never see it mutated
+_generated_explanations: dict = {}
+
 
 # Pydantic models
 class AnomalyRecord(BaseModel):
@@ -41,29 +60,103 @@ class ExplanationResponse(BaseModel):
     explanation: str
 
 
-def load_anomalies() -> pd.DataFrame:
-    """Load anomalies from gold layer, with caching."""
-    global _anomalies_cache
-    
-    if _anomalies_cache is not None:
-        return _anomalies_cache
+def _build_cache(parquet_file: Path) -> tuple:
+    """
+    Read the gold anomalies and prepare them for serving.
     
-    data_dir = Path("data/gold")
-    parquet_file = data_dir / "anomalies.parquet"
-    csv_file = data_dir / "anomalies.csv"
+    Everything is built in locals, so nothing is visible to other requests
+    until the caller publishes the result.
     
-    if parquet_file.exists():
-        _anomalies_cache = pd.read_parquet(parquet_file)
-    elif csv_file.exists():
-        _anomalies_cache = pd.read_csv(csv_file)
-    else:
+    Returns:
+        (DataFrame, claim_id -> first row position, column -> dtype kind)
+    """
+    if not parquet_file.exists():
         raise FileNotFoundError("No anomalies data found. Run the pipeline first.")
     
-    # Ensure claim_id is string
-    if "claim_id" in _anomalies_cache.columns:
-        _anomalies_cache["claim_id"] = _anomalies_cache["claim_id"].astype(str)
+    df = pd.read_parquet(parquet_file, engine="pyarrow")
+    claim_index = {}
+    
+    # Ensure claim_id is string, stored Arrow-backed rather than as Python objects
+    if "claim_id" in df.columns:
+        df["claim_id"] = df["claim_id"].astype(str).astype("string[pyarrow]")
+        
+        # Index first occurrence of each claim_id for O(1) lookups
+        claim_ids = df["claim_id"].to_numpy()
+        first = ~df["claim_id"].duplicated(keep="first").to_numpy()
+        claim_index = dict(zip(claim_ids[first], np.flatnonzero(first)))
+    
+    # Flag counts fit the smallest integer dtype
+    if "num_flags" in df.columns:
+        df["num_flags"] = pd.to_numeric(df["num_flags"], downcast="integer")
+    
+    # Categorical provider_id keeps one copy of each ID and filters on codes
+    if "provider_id" in df.columns:
+        df["provider_id"] = df["provider_id"].astype("category")
+    
+    # Parse service_date once into a NumPy datetime64[ns] column so date filters
+    # are plain datetime64 comparisons (gold may store it Arrow-backed with <NA>)
+    if "service_date" in df.columns:
+        service_date = pd.to_datetime(df["service_date"], errors="coerce")
+        df["service_date"] = service_date.to_numpy(dtype="datetime64[ns]", na_value=np.datetime64("NaT"))
+    
+    # Extension dtypes (category, string, nullable ints) fall back to the generic checks
+    column_kinds = {
+        col: dtype.kind if isinstance(dtype, np.dtype) else "O"
+        for col, dtype in df.dtypes.items()
+    }
+    
+    return df, claim_index, column_kinds
+
+
+def _cached_state() -> tuple:
+    """
+    Return the cached (DataFrame, claim index, column kinds), loading them on first use.
+    
+    The three are read and published together under _cache_lock, so a request
+    never pairs a frame with another load's index (or with none at all).
+    """
+    global _anomalies_cache, _claim_index, _column_kinds
+    
+    with _cache_lock:
+        if _anomalies_cache is None:
+            _anomalies_cache, _claim_index, _column_kinds = _build_cache(ANOMALIES_FILE)
+        return _anomalies_cache, _claim_index, _column_kinds
+
+
+def load_anomalies() -> pd.DataFrame:
+    """Load anomalies from gold layer, with caching."""
+    return _cached_state()[0]
+
+
+def _row_to_record(df: pd.DataFrame, idx: int, kinds: dict) -> dict:
+    """
+    Build a JSON-ready dict for one cached row in a single pass.
     
-    return _anomalies_cache
+    Reads each column positionally with iat and picks the null check from the
+    column's dtype kind recorded at load, so float and datetime cells skip the
+    generic pd.isna dispatch. Missing values become None, datetimes ISO dates,
+    ndarrays lists and numpy scalars Python types.
+    """
+    record = {}
+    for col in df.columns:
+        value = df[col].iat[idx]
+        kind = kinds.get(col)
+        if kind == "f":
+            value = None if math.isnan(value) else float(value)
+        elif kind == "M":
+            value = None if value is pd.NaT else value.strftime("%Y-%m-%d")
+        elif kind in ("i", "u", "b"):
+            value = value.item()
+        elif isinstance(value, np.ndarray):
+            value = value.tolist()
+        elif value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and math.isnan(value)):
+            value = None
+        elif isinstance(value, pd.Timestamp):
+            value = value.strftime("%Y-%m-%d")
+        elif isinstance(value, np.generic):
+            value = value.item()
+        record[col] = value
+    return record
 
 
 @app.get("/", tags=["Health"])
@@ -88,32 +181,35 @@ def get_anomalies(
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     
-    filtered = df.copy()
+    # Combine all filters into a single boolean mask; missing values never match
+    mask = np.ones(len(df), dtype=bool)
     
-    # Apply filters
     if provider_id:
-        filtered = filtered[filtered["provider_id"].astype(str) == provider_id]
+        mask &= (df["provider_id"] == provider_id).to_numpy(dtype=bool, na_value=False)
     
-    if start_date and "service_date" in filtered.columns:
-        filtered["service_date"] = pd.to_datetime(filtered["service_date"], errors="coerce")
-        filtered = filtered[filtered["service_date"] >= pd.to_datetime(start_date)]
+    if start_date and "service_date" in df.columns:
+        mask &= (df["service_date"] >= pd.Timestamp(start_date)).to_numpy(dtype=bool, na_value=False)
     
-    if end_date and "service_date" in filtered.columns:
-        filtered["service_date"] = pd.to_datetime(filtered["service_date"], errors="coerce")
-        filtered = filtered[filtered["service_date"] <= pd.to_datetime(end_date)]
+    if end_date and "service_date" in df.columns:
+        mask &= (df["service_date"] <= pd.Timestamp(end_date)).to_numpy(dtype=bool, na_value=False)
     
-    if severity and "num_flags" in filtered.columns:
-        filtered = filtered[filtered["num_flags"] >= severity]
+    if severity and "num_flags" in df.columns:
+        mask &= (df["num_flags"] >= severity).to_numpy(dtype=bool, na_value=False)
     
-    # Convert dates to string for JSON
+    # Limit results
+    filtered = df[mask].head(limit)
+    
+    # Format dates as ISO strings for the returned rows only
     if "service_date" in filtered.columns:
-        filtered["service_date"] = filtered["service_date"].astype(str)
+        filtered = filtered.assign(service_date=filtered["service_date"].dt.strftime("%Y-%m-%d"))
     
-    # Limit results
-    filtered = filtered.head(limit)
+    # List-valued columns come back from Parquet as ndarrays; emit JSON lists
+    if "anomaly_reasons" in filtered.columns:
+        filtered = filtered.assign(anomaly_reasons=filtered["anomaly_reasons"].map(
+            lambda v: list(v) if isinstance(v, np.ndarray) else v))
     
-    # Convert to dict records
-    records = filtered.fillna("").to_dict(orient="records")
+    # Convert to dict records, missing values serialize as null
+    records = filtered.astype(object).where(filtered.notna(), None).to_dict(orient="records")
     
     return AnomalyListResponse(total=len(records), anomalies=records)
 
@@ -122,38 +218,38 @@ def get_anomalies(
 def get_claim_explanation(claim_id: str):
     """
     Get anomaly record and explanation for a specific claim.
-    If explanation is missing, generates it using LLM.
+    If explanation is missing, generates it using LLM and remembers it so
+    repeat requests skip the LLM call. The handler is sync, so FastAPI runs
+    the Parquet load and the LLM call in its worker threadpool.
     """
     try:
-        df = load_anomalies()
+        df, claim_index, kinds = _cached_state()
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     
-    # Find the claim
-    claim_record = df[df["claim_id"] == claim_id]
+    # Find the claim (the index is empty when the file has no claim_id column)
+    idx = claim_index.get(claim_id) if claim_index else None
     
-    if claim_record.empty:
+    if idx is None:
         raise HTTPException(status_code=404, detail=f"Claim {claim_id} not found in anomalies")
     
-    record = claim_record.iloc[0].to_dict()
+    record = _row_to_record(df, idx, kinds)
     
     # Check if explanation exists
-    explanation = record.get("explanation", "")
+    explanation = record.get("explanation") or _generated_explanations.get(claim_id)
     
-    if not explanation or pd.isna(explanation) or explanation == "":
+    if not explanation:
         # Generate explanation using LLM
         try:
             from src.llm.explain import explain_anomaly
             explanation = explain_anomaly(record)
+            _generated_explanations[claim_id] = explanation
         except Exception as e:
             explanation = f"Could not generate explanation: {str(e)}"
     
-    # Clean up NaN values for JSON
-    clean_record = {k: (v if pd.notna(v) else None) for k, v in record.items()}
-    
     return ExplanationResponse(
         claim_id=claim_id,
-        anomaly_record=clean_record,
+        anomaly_record=record,
         explanation=explanation
     )
 
@@ -177,25 +273,29 @@ def get_stats():
         stats["max_flags"] = int(df["num_flags"].max())
     
     if "anomaly_reasons_str" in df.columns:
-        all_reasons = []
-        for reasons_str in df["anomaly_reasons_str"].dropna():
-            if reasons_str:
-                all_reasons.extend(reasons_str.split(","))
-        reason_counts = pd.Series(all_reasons).value_counts().to_dict()
-        stats["anomaly_types"] = reason_counts
+        reasons_str = df["anomaly_reasons_str"].dropna()
+        reasons_str = reasons_str[reasons_str != ""]
+        stats["anomaly_types"] = reasons_str.str.split(",").explode().value_counts().to_dict()
     
     return stats
 
 
 @app.post("/refresh", tags=["Admin"])
 def refresh_cache():
-    """Clear the cache and reload data."""
-    global _anomalies_cache
-    _anomalies_cache = None
+    global _anomalies_cache, _claim_index, _column_kinds
     
+    # Build the new cache outside the lock so other requests keep being served
+    # from the old one, then swap all three globals in at once
     try:
-        load_anomalies()
-        return {"status": "ok", "message": "Cache refreshed successfully"}
+        state, error = _build_cache(ANOMALIES_FILE), None
     except FileNotFoundError as e:
-        raise HTTPException(status_code=404, detail=str(e))
+        state, error = (None, None, None), e
+    
+    with _cache_lock:
+        _anomalies_cache, _claim_index, _column_kinds = state
+        _generated_explanations.clear()
+    
+    if error is not None:
+        raise HTTPException(status_code=404, detail=str(error))
+    return {"status": "ok", "message": "Cache refreshed successfully"}
 
@@ -0,0 +1,10 @@
+import re
+
+# ICD-10 format: Letter followed by 2+ digits, optional decimal
+ICD_PATTERN = re.compile(r"^[A-Z]\d{2}\.?\d*[A-Z]?$")
+
+# CPT codes are 5 digits
+CPT_PATTERN = re.compile(r"^\d{5}$")
+
+# Repetitive string columns stored dictionary-encoded as categoricals in gold
+CATEGORICAL_COLUMNS = ["provider_id", "claim_status", "anomaly_reasons_str", "flags_list"]
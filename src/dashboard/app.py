@@ -2,11 +2,21 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from pathlib import Path
+import io
 import sys
+import importlib
+from functools import lru_cache
+import pyarrow.parquet as pq
 
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
+# Columns the dashboard filters on, charts, displays or exports
+DASHBOARD_COLUMNS = [
+    "claim_id", "member_id", "provider_id", "claim_amount", "service_date",
+    "claim_status", "icd_code", "cpt_code", "anomaly_reasons_str", "explanation", "num_flags",
+]
+
 
 # Page configuration
 st.set_page_config(
@@ -16,37 +26,39 @@ st.set_page_config(
 )
 
 
+@lru_cache(maxsize=None)
+def pipeline_step(module: str, name: str):
+    """Import a pipeline function on first use so cold starts skip the pipeline stack."""
+    return getattr(importlib.import_module(module), name)
+
+
 @st.cache_resource
 def run_pipeline_once():
     """Run the pipeline once on startup if data doesn't exist."""
     data_dir = Path("data/gold")
-    anomalies_file = data_dir / "anomalies.csv"
+    anomalies_file = data_dir / "anomalies.parquet"
     
     # Check if data exists
     if not anomalies_file.exists():
         with st.spinner("🔄 Running data pipeline for the first time..."):
             try:
-                from src.ingestion.ingest import run_ingest
-                from src.transform.transform import run_transform
-                from src.dq.rules import run_dq
-                from src.anomaly.detect import detect_anomalies
-                from src.llm.explain import explain_anomaly
-                
                 # Run pipeline steps
                 st.info("Step 1/5: Ingesting data...")
-                run_ingest()
+                pipeline_step("src.ingestion.ingest", "run_ingest")()
                 
                 st.info("Step 2/5: Transforming data...")
-                transform_results = run_transform()
+                transform_results = pipeline_step("src.transform.transform", "run_transform")()
                 
                 st.info("Step 3/5: Running DQ rules...")
-                dq_anomalies = run_dq()
+                dq_anomalies = pipeline_step("src.dq.rules", "run_dq")()
                 
                 st.info("Step 4/5: Detecting anomalies...")
-                anomalies = detect_anomalies(dq_anomalies)
+                anomalies = pipeline_step("src.anomaly.detect", "detect_anomalies")(dq_anomalies)
                 
                 st.info("Step 5/5: Generating explanations...")
                 if anomalies is not None and len(anomalies) > 0:
+                    # Only pull in the LLM client when there is something to explain
+                    explain_anomaly = pipeline_step("src.llm.explain", "explain_anomaly")
                     # Generate explanations for top 20
                     anomalies_sorted = anomalies.sort_values("num_flags", ascending=False) if "num_flags" in anomalies.columns else anomalies
                     explanations = []
@@ -64,7 +76,6 @@ def run_pipeline_once():
                     output_dir = Path("data/gold")
                     output_dir.mkdir(parents=True, exist_ok=True)
                     anomalies.to_parquet(output_dir / "anomalies.parquet", index=False)
-                    anomalies.to_csv(output_dir / "anomalies.csv", index=False)
                 
                 st.success("✅ Pipeline completed successfully!")
                 return True
@@ -79,17 +90,26 @@ def load_data():
     """Load anomalies and claims data."""
     data_dir = Path("data/gold")
     
-    # Load anomalies
-    anomalies_file = data_dir / "anomalies.csv"
-    if anomalies_file.exists():
-        anomalies = pd.read_csv(anomalies_file)
+    # Load anomalies, preferring Parquet and reading only the columns used here
+    parquet_file = data_dir / "anomalies.parquet"
+    csv_file = data_dir / "anomalies.csv"
+    if parquet_file.exists():
+        available = set(pq.read_schema(parquet_file).names)
+        columns = [c for c in DASHBOARD_COLUMNS if c in available]
+        anomalies = pd.read_parquet(parquet_file, columns=columns, engine="pyarrow")
+    elif csv_file.exists():
+        anomalies = pd.read_csv(csv_file, usecols=lambda c: c in DASHBOARD_COLUMNS)
     else:
         anomalies = pd.DataFrame()
     
+    # Parse service dates once here rather than on every rerun
+    if "service_date" in anomalies.columns:
+        anomalies["service_date"] = pd.to_datetime(anomalies["service_date"], errors="coerce", format="ISO8601")
+    
     # Load clean claims for total count
     clean_file = data_dir / "claims_clean.parquet"
     if clean_file.exists():
-        clean_claims = pd.read_parquet(clean_file)
+        clean_claims = pd.read_parquet(clean_file, columns=["claim_id"], engine="pyarrow")
         total_claims = len(clean_claims) + len(anomalies)
     else:
         total_claims = len(anomalies)
@@ -102,12 +122,82 @@ def get_anomaly_counts(anomalies: pd.DataFrame) -> pd.Series:
     if "anomaly_reasons_str" not in anomalies.columns:
         return pd.Series()
     
-    all_reasons = []
-    for reasons_str in anomalies["anomaly_reasons_str"].dropna():
-        if reasons_str:
-            all_reasons.extend(reasons_str.split(","))
+    reasons_str = anomalies["anomaly_reasons_str"].dropna()
+    reasons_str = reasons_str[reasons_str != ""]
+    if reasons_str.empty:
+        return pd.Series(dtype="int64")
     
-    return pd.Series(all_reasons).value_counts()
+    return reasons_str.str.split(",").explode().value_counts()
+
+
+@st.cache_data(show_spinner=False)
+def build_reason_index(reasons_str: pd.Series) -> dict:
+    """Map each anomaly reason to a boolean mask over the rows flagged with it."""
+    n_rows = len(reasons_str)
+    exploded = reasons_str.reset_index(drop=True).dropna().astype(str).str.split(",").explode()
+    exploded = exploded[exploded != ""]
+    
+    positions = exploded.index.to_numpy()
+    codes, reasons = pd.factorize(exploded)
+    
+    reason_index = {}
+    for code, reason in enumerate(reasons):
+        mask = np.zeros(n_rows, dtype=bool)
+        mask[positions[codes == code]] = True
+        reason_index[reason] = mask
+    return reason_index
+
+
+@st.cache_data(show_spinner=False)
+def full_value_counts(values: pd.Series) -> pd.Series:
+    """Count values over the full anomaly set once per load."""
+    return values.value_counts(sort=False)
+
+
+def filtered_value_counts(anomalies: pd.DataFrame, filtered: pd.DataFrame, column: str) -> pd.Series:
+    """
+    Count values of column in the filtered view.
+    
+    The unfiltered view reuses the cached full counts; otherwise only the
+    filtered slice is counted. Categories with no rows are dropped.
+    """
+    if len(filtered) == len(anomalies):
+        counts = full_value_counts(anomalies[column])
+    else:
+        counts = filtered[column].value_counts(sort=False)
+    return counts[counts > 0]
+
+
+@st.cache_data(show_spinner=False)
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """Serialize a DataFrame to CSV once per distinct content."""
+    return df.to_csv(index=False).encode("utf-8")
+
+
+@st.cache_data(show_spinner=False)
+def to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    """Serialize a DataFrame to ZSTD-compressed Parquet once per distinct content."""
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, engine="pyarrow", compression="zstd", index=False)
+    return buffer.getvalue()
+
+
+def top_rows(df: pd.DataFrame, sort_col: str, n_rows: int, ascending: bool) -> pd.DataFrame:
+    """
+    Return the first n_rows of df ordered by sort_col without a full sort.
+    
+    Numeric and datetime columns use nsmallest/nlargest, with missing values
+    appended last as sort_values would place them; other columns fall back
+    to sort_values.
+    """
+    column = df[sort_col]
+    if not (pd.api.types.is_numeric_dtype(column) or pd.api.types.is_datetime64_any_dtype(column)):
+        return df.sort_values(sort_col, ascending=ascending).head(n_rows)
+    
+    top = df.nsmallest(n_rows, sort_col) if ascending else df.nlargest(n_rows, sort_col)
+    if len(top) < n_rows:
+        top = pd.concat([top, df[column.isna()].head(n_rows - len(top))])
+    return top
 
 
 def app():
@@ -140,7 +230,6 @@ def app():
     
     # Date range filter
     if "service_date" in anomalies.columns:
-        anomalies["service_date"] = pd.to_datetime(anomalies["service_date"], errors="coerce")
         valid_dates = anomalies["service_date"].dropna()
         
         if len(valid_dates) > 0:
@@ -166,19 +255,35 @@ def app():
     else:
         selected_anomaly_type = "All"
     
-    # Apply filters
-    filtered = anomalies.copy()
+    # Apply filters as one fused expression and slice once; pd.eval runs it
+    # through numexpr in a single threaded pass when numexpr is installed
+    clauses = []
+    operands = {}
     
     if selected_provider != "All":
-        filtered = filtered[filtered["provider_id"] == selected_provider]
+        operands["provider_match"] = (anomalies["provider_id"] == selected_provider).to_numpy()
+        clauses.append("provider_match")
     
     if date_range and len(date_range) == 2:
         start_date, end_date = date_range
-        mask = (filtered["service_date"].dt.date >= start_date) & (filtered["service_date"].dt.date <= end_date)
-        filtered = filtered[mask | filtered["service_date"].isna()]
+        # Compare raw int64 nanoseconds; the day after end_date is the exclusive bound
+        operands["t"] = anomalies["service_date"].to_numpy(dtype="datetime64[ns]").view("i8")
+        operands["lo"] = np.datetime64(start_date, "ns").astype("i8")
+        operands["hi"] = (np.datetime64(end_date, "ns") + np.timedelta64(1, "D")).astype("i8")
+        operands["nat"] = np.datetime64("NaT", "ns").astype("i8")
+        clauses.append("((t >= lo) & (t < hi) | (t == nat))")
+    
+    if selected_anomaly_type != "All" and "anomaly_reasons_str" in anomalies.columns:
+        reason_index = build_reason_index(anomalies["anomaly_reasons_str"])
+        operands["reason_match"] = reason_index.get(selected_anomaly_type, np.zeros(len(anomalies), dtype=bool))
+        clauses.append("reason_match")
+    
+    if clauses:
+        mask = np.asarray(pd.eval(" & ".join(clauses), local_dict=operands), dtype=bool)
+    else:
+        mask = np.ones(len(anomalies), dtype=bool)
     
-    if selected_anomaly_type != "All":
-        filtered = filtered[filtered["anomaly_reasons_str"].str.contains(selected_anomaly_type, na=False)]
+    filtered = anomalies.iloc[mask]
     
     # KPI Cards
     st.header("📈 Key Metrics")
@@ -234,7 +339,7 @@ def app():
     with col2:
         st.subheader("Anomalies by Provider (Top 10)")
         if "provider_id" in filtered.columns:
-            provider_counts = filtered["provider_id"].value_counts().head(10)
+            provider_counts = filtered_value_counts(anomalies, filtered, "provider_id").nlargest(10)
             if len(provider_counts) > 0:
                 chart_data = pd.DataFrame({
                     "Provider": provider_counts.index,
@@ -252,7 +357,7 @@ def app():
     with col1:
         st.subheader("Anomalies by Claim Status")
         if "claim_status" in filtered.columns:
-            status_counts = filtered["claim_status"].value_counts()
+            status_counts = filtered_value_counts(anomalies, filtered, "claim_status").sort_values(ascending=False)
             if len(status_counts) > 0:
                 chart_data = pd.DataFrame({
                     "Status": status_counts.index,
@@ -263,9 +368,10 @@ def app():
     with col2:
         st.subheader("Anomalies Over Time")
         if "service_date" in filtered.columns:
-            time_data = filtered.copy()
-            time_data["month"] = time_data["service_date"].dt.to_period("M").astype(str)
-            monthly_counts = time_data.groupby("month").size()
+            # Histogram straight off the datetime64 column, bucketed by month
+            months = filtered["service_date"].to_numpy(dtype="datetime64[ns]").astype("datetime64[M]")
+            months, counts = np.unique(months[~np.isnat(months)], return_counts=True)
+            monthly_counts = pd.Series(counts, index=months.astype("datetime64[ns]"), name="count")
             if len(monthly_counts) > 0:
                 st.line_chart(monthly_counts)
     
@@ -285,7 +391,8 @@ def app():
     sort_asc = st.checkbox("Ascending order", value=False)
     
     if sort_col in filtered.columns:
-        display_df = filtered.sort_values(sort_col, ascending=sort_asc).head(n_rows)
+        projected = filtered[list(dict.fromkeys(display_cols + [sort_col]))]
+        display_df = top_rows(projected, sort_col, n_rows, sort_asc)
     else:
         display_df = filtered.head(n_rows)
     
@@ -320,22 +427,32 @@ def app():
     col1, col2 = st.columns(2)
     
     with col1:
-        csv_data = filtered.to_csv(index=False)
         st.download_button(
             label="Download Filtered Anomalies (CSV)",
-            data=csv_data,
+            data=to_csv_bytes(filtered),
             file_name="filtered_anomalies.csv",
             mime="text/csv"
         )
+        st.download_button(
+            label="Download Filtered Anomalies (Parquet)",
+            data=to_parquet_bytes(filtered),
+            file_name="filtered_anomalies.parquet",
+            mime="application/octet-stream"
+        )
     
     with col2:
-        full_csv = anomalies.to_csv(index=False)
         st.download_button(
             label="Download All Anomalies (CSV)",
-            data=full_csv,
+            data=to_csv_bytes(anomalies),
             file_name="all_anomalies.csv",
             mime="text/csv"
         )
+        st.download_button(
+            label="Download All Anomalies (Parquet)",
+            data=to_parquet_bytes(anomalies),
+            file_name="all_anomalies.parquet",
+            mime="application/octet-stream"
+        )
 
 
 if __name__ == "__main__":
@@ -1,8 +1,19 @@
 import streamlit as st
 import json
+import mmap
 import os
 from pathlib import Path
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_loads(data) -> dict:
+        return json.loads(bytes(data))
+
+# Resources at least this large are parsed straight from a memory map
+MMAP_THRESHOLD_BYTES = 1 << 20
+
 # Page configuration
 st.set_page_config(
     page_title="FHIR Resources Viewer",
@@ -11,6 +22,7 @@ st.set_page_config(
 )
 
 
+@st.cache_data(ttl=60)
 def get_fhir_files(base_dir: str = "data/fhir") -> dict:
     """Get all FHIR JSON files organized by resource type."""
     base_path = Path(base_dir)
@@ -19,22 +31,44 @@ def get_fhir_files(base_dir: str = "data/fhir") -> dict:
     if not base_path.exists():
         return files_by_type
     
-    # Check subdirectories (Patient, Practitioner, Claim, Encounter)
-    for subdir in base_path.iterdir():
-        if subdir.is_dir():
-            resource_type = subdir.name
-            json_files = sorted(subdir.glob("*.json"))
-            if json_files:
-                files_by_type[resource_type] = json_files
+    # One scandir pass per directory; DirEntry type checks come from the
+    # directory listing itself, so no per-file stat calls are issued
+    root_files = []
+    with os.scandir(base_path) as entries:
+        for entry in entries:
+            # Check subdirectories (Patient, Practitioner, Claim, Encounter)
+            if entry.is_dir():
+                json_files = _scan_json_files(entry.path)
+                if json_files:
+                    files_by_type[entry.name] = json_files
+            # Also check root directory for any JSON files
+            elif entry.name.endswith(".json") and not entry.name.startswith("."):
+                root_files.append(Path(entry.path))
     
-    # Also check root directory for any JSON files
-    root_files = list(base_path.glob("*.json"))
     if root_files:
         files_by_type["Other"] = sorted(root_files)
     
     return files_by_type
 
 
+def _scan_json_files(directory: str) -> list:
+    """List the JSON files directly inside directory, sorted by path."""
+    with os.scandir(directory) as entries:
+        return sorted(
+            Path(e.path) for e in entries
+            if e.name.endswith(".json") and not e.name.startswith(".") and e.is_file()
+        )
+
+
+def load_fhir_resource(file_path: Path) -> dict:
+    """Parse a FHIR JSON file, memory-mapping large resources instead of copying them."""
+    with open(file_path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size < MMAP_THRESHOLD_BYTES:
+            return _json_loads(fh.read())
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buffer, memoryview(buffer) as view:
+            return _json_loads(view)
+
+
 def display_patient(data: dict):
     """Display Patient resource details."""
     col1, col2 = st.columns(2)
@@ -207,8 +241,7 @@ def app():
             file_path = next(f for f in files if f.name == selected_file)
             
             # Load and display
-            with open(file_path) as fh:
-                data = json.load(fh)
+            data = load_fhir_resource(file_path)
             
             # Display header
             st.header(f"{data.get('resourceType', 'Unknown')} Resource")
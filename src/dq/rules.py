@@ -1,73 +1,104 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import os
 import re
+import sys
 
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-def missing_mandatory_fields(df: pd.DataFrame) -> pd.Series:
+from src.constants import CATEGORICAL_COLUMNS, CPT_PATTERN, ICD_PATTERN
+
+
+def build_rule_context(df: pd.DataFrame) -> dict:
+    """
+    Precompute the typed columns shared by several DQ rules.
+    
+    Args:
+        df: Claims DataFrame
+    
+    Returns:
+        Dict with "amount" (numeric claim_amount) and "date" (parsed service_date)
+    """
+    return {
+        "amount": pd.to_numeric(df["claim_amount"], errors="coerce"),
+        "date": pd.to_datetime(df["service_date"], errors="coerce"),
+    }
+
+
+def missing_mandatory_fields(df: pd.DataFrame, ctx: dict = None) -> pd.Series:
     """Check for missing values in mandatory fields."""
     mandatory_fields = ["claim_id", "member_id", "provider_id", "claim_amount", "service_date"]
     missing_mask = df[mandatory_fields].isnull().any(axis=1)
     return missing_mask
 
 
-def duplicate_claim_id(df: pd.DataFrame) -> pd.Series:
+def duplicate_claim_id(df: pd.DataFrame, ctx: dict = None) -> pd.Series:
     """Identify duplicate claim IDs."""
-    return df.duplicated(subset=["claim_id"], keep=False)
+    # Hash-count the single column instead of the row-wise duplicated path;
+    # dropna=False keeps repeated missing IDs flagged as duplicates
+    claim_ids = df["claim_id"]
+    counts = claim_ids.value_counts(dropna=False)
+    return claim_ids.isin(counts.index[counts > 1])
 
 
-def invalid_dates(df: pd.DataFrame) -> pd.Series:
+def invalid_dates(df: pd.DataFrame, ctx: dict = None) -> pd.Series:
     """Check for invalid or missing service dates."""
     # Dates should be valid and not in the future
-    dates = pd.to_datetime(df["service_date"], errors="coerce")
-    today = pd.Timestamp.now()
+    dates = ctx["date"] if ctx else pd.to_datetime(df["service_date"], errors="coerce")
+    values = dates.to_numpy(dtype="datetime64[ns]", na_value=np.datetime64("NaT"))
+    today = np.datetime64(pd.Timestamp.now(), "ns")
     
-    invalid_mask = dates.isnull() | (dates > today)
-    return invalid_mask
+    # NaT compares False, so the future check needs no null masking
+    return pd.Series(np.isnat(values) | (values > today), index=df.index)
 
 
-def negative_or_zero_amount(df: pd.DataFrame) -> pd.Series:
+def negative_or_zero_amount(df: pd.DataFrame, ctx: dict = None) -> pd.Series:
     """Check for negative or zero claim amounts."""
-    amounts = pd.to_numeric(df["claim_amount"], errors="coerce")
+    amounts = ctx["amount"] if ctx else pd.to_numeric(df["claim_amount"], errors="coerce")
     return (amounts <= 0) | amounts.isnull()
 
 
-def invalid_icd_format(df: pd.DataFrame) -> pd.Series:
+def _regex_mismatch(codes: pd.Series, pattern: re.Pattern, upper: bool = False) -> pd.Series:
+    """Flag codes that do not fully match pattern, running RE2 over the Arrow buffer."""
+    values = pc.utf8_trim_whitespace(pa.array(codes.astype("string[pyarrow]")))
+    if upper:
+        values = pc.utf8_upper(values)
+    # Missing, empty and "nan"/"None" placeholders never match the pattern
+    matched = pc.fill_null(pc.match_substring_regex(values, pattern.pattern), False)
+    return pd.Series(~np.asarray(matched, dtype=bool), index=codes.index)
+
+
+def invalid_icd_format(df: pd.DataFrame, ctx: dict = None) -> pd.Series:
     """Check for invalid ICD-10 code format."""
-    def is_invalid_icd(code):
-        if pd.isna(code) or str(code) in ["nan", "None", ""]:
-            return True
-        code = str(code).strip().upper()
-        # ICD-10 format: Letter followed by 2+ digits, optional decimal
-        pattern = r"^[A-Z]\d{2}\.?\d*[A-Z]?$"
-        return not bool(re.match(pattern, code))
-    
-    return df["icd_code"].apply(is_invalid_icd)
+    return _regex_mismatch(df["icd_code"], ICD_PATTERN, upper=True)
 
 
-def invalid_cpt_format(df: pd.DataFrame) -> pd.Series:
+def invalid_cpt_format(df: pd.DataFrame, ctx: dict = None) -> pd.Series:
     """Check for invalid CPT code format."""
-    def is_invalid_cpt(code):
-        if pd.isna(code) or str(code) in ["nan", "None", ""]:
-            return True
-        code = str(code).strip()
-        # CPT codes are 5 digits
-        return not bool(re.match(r"^\d{5}$", code))
-    
-    return df["cpt_code"].apply(is_invalid_cpt)
+    return _regex_mismatch(df["cpt_code"], CPT_PATTERN)
 
 
-def outlier_amount(df: pd.DataFrame, threshold: float = 3.0) -> pd.Series:
+def outlier_amount(df: pd.DataFrame, threshold: float = 3.0, ctx: dict = None) -> pd.Series:
     """Detect outliers in claim amounts using z-score method."""
-    amounts = pd.to_numeric(df["claim_amount"], errors="coerce")
-    mean_amt = amounts.mean()
-    std_amt = amounts.std()
+    amounts = ctx["amount"] if ctx else pd.to_numeric(df["claim_amount"], errors="coerce")
+    values = amounts.to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = values[~np.isnan(values)]
+    
+    if valid.size < 2:
+        return pd.Series(np.zeros(len(df), dtype=bool), index=df.index)
     
-    if std_amt == 0 or pd.isna(std_amt):
-        return pd.Series([False] * len(df), index=df.index)
+    std_amt = valid.std(ddof=1)
+    if std_amt == 0:
+        return pd.Series(np.zeros(len(df), dtype=bool), index=df.index)
     
-    z_scores = np.abs((amounts - mean_amt) / std_amt)
-    return z_scores > threshold
+    z_scores = np.abs((values - valid.mean()) / std_amt)
+    return pd.Series(z_scores > threshold, index=df.index)
 
 
 # Define all DQ rules
@@ -82,13 +113,23 @@ DQ_RULES = {
 }
 
 
-def run_dq(silver_dir="data/silver", output_dir="data/gold"):
+def write_gold_parquet(df: pd.DataFrame, path):
+    """Write a gold table with categorical string columns and ZSTD compression."""
+    categorical = {c: "category" for c in CATEGORICAL_COLUMNS if c in df.columns}
+    df.astype(categorical).to_parquet(
+        path, engine="pyarrow", compression="zstd", compression_level=3,
+        use_dictionary=True, index=False,
+    )
+
+
+def run_dq(silver_dir="data/silver", output_dir="data/gold", emit_csv: bool = False):
     """
     Run data quality rules on silver layer claims and output anomalies.
     
     Args:
         silver_dir: Directory containing silver parquet files
         output_dir: Directory to write anomaly outputs (gold layer)
+        emit_csv: Also write anomalies.csv next to the Parquet output
     
     Returns:
         DataFrame containing all flagged anomalies
@@ -104,25 +145,39 @@ def run_dq(silver_dir="data/silver", output_dir="data/gold"):
         return None
     
     print(f"Loading claims from {claims_file}...")
-    df = pd.read_parquet(claims_file)
+    # Arrow-backed dtypes keep null checks, comparisons and casts in C loops;
+    # the file is memory-mapped and decoded on Arrow's thread pool
+    df = pq.read_table(claims_file, use_threads=True, memory_map=True).to_pandas(types_mapper=pd.ArrowDtype)
     print(f"  Loaded {len(df)} rows")
     
     # Apply all DQ rules
     print("\nApplying DQ rules...")
-    flags_df = pd.DataFrame(index=df.index)
-    
-    for rule_name, rule_func in DQ_RULES.items():
-        flags_df[rule_name] = rule_func(df)
-        flagged_count = flags_df[rule_name].sum()
+    ctx = build_rule_context(df)
+    
+    # Rules are independent and mostly run in NumPy/Arrow kernels, so evaluate them concurrently
+    max_workers = min(len(DQ_RULES), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            rule_name: executor.submit(rule_func, df, ctx=ctx)
+            for rule_name, rule_func in DQ_RULES.items()
+        }
+    
+    # Collect the rule hits into one contiguous boolean matrix (rows x rules)
+    rule_names = list(futures)
+    flag_matrix = np.zeros((len(df), len(rule_names)), dtype=bool)
+    for i, rule_name in enumerate(rule_names):
+        flag_matrix[:, i] = futures[rule_name].result().to_numpy(dtype=bool, na_value=False)
+        flagged_count = int(flag_matrix[:, i].sum())
         print(f"  {rule_name}: {flagged_count} flagged ({flagged_count/len(df)*100:.1f}%)")
     
-    # Create flags_list and num_flags columns
-    def get_flags_list(row):
-        flags = [col for col in flags_df.columns if row[col]]
-        return ",".join(flags) if flags else ""
+    # Create flags_list and num_flags columns from the boolean rule matrix:
+    # each hit contributes ",<rule>", row-wise concatenation joins them and
+    # the leading comma is dropped
+    prefixed_names = np.array(["," + name for name in rule_names], dtype=object)
+    joined = np.where(flag_matrix, prefixed_names, "").sum(axis=1)
     
-    df["flags_list"] = flags_df.apply(get_flags_list, axis=1)
-    df["num_flags"] = flags_df.sum(axis=1)
+    df["flags_list"] = pd.Series(joined, index=df.index, dtype=object).str[1:]
+    df["num_flags"] = flag_matrix.sum(axis=1, dtype=np.int8)
     
     # Filter to only anomalies (rows with at least one flag)
     anomalies = df[df["num_flags"] > 0].copy()
@@ -131,19 +186,21 @@ def run_dq(silver_dir="data/silver", output_dir="data/gold"):
     
     # Write outputs
     parquet_file = output_path / "anomalies.parquet"
-    csv_file = output_path / "anomalies.csv"
-    
-    anomalies.to_parquet(parquet_file, index=False)
-    anomalies.to_csv(csv_file, index=False)
+    write_gold_parquet(anomalies, parquet_file)
     
     print(f"\nOutputs written to:")
     print(f"  {parquet_file}")
-    print(f"  {csv_file}")
+    
+    # The CSV mirror is opt-in; Parquet is the canonical output
+    if emit_csv:
+        csv_file = output_path / "anomalies.csv"
+        anomalies.to_csv(csv_file, index=False, chunksize=100_000)
+        print(f"  {csv_file}")
     
     # Also write clean claims (no flags) to gold
     clean_claims = df[df["num_flags"] == 0].drop(columns=["flags_list", "num_flags"])
     clean_file = output_path / "claims_clean.parquet"
-    clean_claims.to_parquet(clean_file, index=False)
+    write_gold_parquet(clean_claims, clean_file)
     print(f"  {clean_file} ({len(clean_claims)} clean claims)")
     
     # Summary statistics
@@ -1,9 +1,17 @@
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 import json
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from datetime import datetime
+from datetime import date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Standard FHIR system URIs
 DEFAULT_SYSTEMS = {
@@ -16,8 +24,65 @@ DEFAULT_SYSTEMS = {
 }
 
 
+# Claim status -> FHIR Claim.status / Encounter.status
+CLAIM_STATUS_MAP = {
+    "PAID": "active",
+    "DENIED": "cancelled",
+    "PENDING": "draft",
+    "APPEALED": "draft"
+}
+
+ENCOUNTER_STATUS_MAP = {
+    "PAID": "finished",
+    "DENIED": "cancelled",
+    "PENDING": "in-progress",
+    "APPEALED": "in-progress"
+}
+
+
+def _claim_type() -> Dict:
+    """Claim.type CodeableConcept for a professional claim."""
+    return {
+        "coding": [
+            {
+                "system": "http://terminology.hl7.org/CodeSystem/claim-type",
+                "code": "professional",
+                "display": "Professional"
+            }
+        ]
+    }
+
+
+def _encounter_class() -> Dict:
+    """Encounter.class Coding for an ambulatory encounter."""
+    return {
+        "system": "http://terminology.hl7.org/CodeSystem/v3-ActCode",
+        "code": "AMB",
+        "display": "ambulatory"
+    }
+
+
+# Constant subtrees shared by every resource of a bulk build. Those resources
+# are built for serialization only, so these dicts must never be mutated;
+# the per-row mappers build fresh copies instead.
+_CLAIM_TYPE = _claim_type()
+_ENCOUNTER_CLASS = _encounter_class()
+
+# Source fields read by map_patient_to_fhir / map_practitioner_to_fhir
+PATIENT_FIELDS = ["member_id", "first_name", "last_name", "dob", "gender"]
+PRACTITIONER_FIELDS = ["provider_id", "provider_name", "specialty", "state", "npi"]
+
+
 def _safe_str(value: Any) -> Optional[str]:
     """Convert value to string, return None for NaN/None."""
+    # Fast paths for the common scalar types; pd.isna only for the rest
+    # (NaT, pd.NA, NumPy scalars)
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float):
+        return None if value != value else str(value)
     if pd.isna(value):
         return None
     return str(value)
@@ -25,7 +90,11 @@ def _safe_str(value: Any) -> Optional[str]:
 
 def _safe_float(value: Any) -> Optional[float]:
     """Convert value to float, return None for NaN/None."""
-    if pd.isna(value):
+    if value is None:
+        return None
+    if isinstance(value, float):
+        return None if value != value else float(value)
+    if not isinstance(value, str) and pd.isna(value):
         return None
     try:
         return float(value)
@@ -33,12 +102,21 @@ def _safe_float(value: Any) -> Optional[float]:
         return None
 
 
+def _safe_date(value: Any) -> Optional[str]:
+    """Format a date/timestamp as YYYY-MM-DD; other values go through _safe_str."""
+    if value is pd.NaT:
+        return None
+    if isinstance(value, (date, np.datetime64)):
+        return pd.Timestamp(value).strftime("%Y-%m-%d")
+    return _safe_str(value)
+
+
 def map_patient_to_fhir(member_row: pd.Series, id_system: str = "urn:uuid", mapping_config: dict = None) -> Dict:
     """
     Map a member row to a minimal FHIR Patient resource.
     
     Args:
-        member_row: Pandas Series with member data
+        member_row: Member record (pandas Series or dict)
         id_system: System URI for identifier
         mapping_config: Optional custom mapping configuration
     
@@ -91,7 +169,7 @@ def map_practitioner_to_fhir(provider_row: pd.Series, id_system: str = "urn:uuid
     Map a provider row to a minimal FHIR Practitioner resource.
     
     Args:
-        provider_row: Pandas Series with provider data
+        provider_row: Provider record (pandas Series or dict)
         id_system: System URI for identifier
         mapping_config: Optional custom mapping configuration
     
@@ -166,8 +244,8 @@ def map_encounter_to_fhir(claim_row: pd.Series, member_row: pd.Series = None, ma
     Map a claim to a minimal FHIR Encounter resource.
     
     Args:
-        claim_row: Pandas Series with claim data
-        member_row: Optional Pandas Series with member data
+        claim_row: Claim record (pandas Series or dict)
+        member_row: Optional member record (pandas Series or dict)
         mapping_config: Optional custom mapping configuration
     
     Returns:
@@ -176,18 +254,17 @@ def map_encounter_to_fhir(claim_row: pd.Series, member_row: pd.Series = None, ma
     claim_id = _safe_str(claim_row.get("claim_id"))
     member_id = _safe_str(claim_row.get("member_id"))
     provider_id = _safe_str(claim_row.get("provider_id"))
-    service_date = _safe_str(claim_row.get("service_date"))
+    service_date = _safe_date(claim_row.get("service_date"))
     
     # Map claim status to encounter status
     claim_status = _safe_str(claim_row.get("claim_status"))
-    status_map = {
-        "PAID": "finished",
-        "DENIED": "cancelled",
-        "PENDING": "in-progress",
-        "APPEALED": "in-progress"
-    }
-    encounter_status = status_map.get(claim_status, "unknown") if claim_status else "unknown"
+    encounter_status = ENCOUNTER_STATUS_MAP.get(claim_status, "unknown") if claim_status else "unknown"
     
+    return _encounter_resource(_encounter_class(), claim_id, member_id, provider_id, service_date, encounter_status)
+
+
+def _encounter_resource(encounter_class, claim_id, member_id, provider_id, service_date, encounter_status) -> Dict:
+    """Assemble an Encounter resource from already-normalized field values and an Encounter.class."""
     encounter = {
         "resourceType": "Encounter",
         "id": f"enc-{claim_id}",
@@ -198,11 +275,7 @@ def map_encounter_to_fhir(claim_row: pd.Series, member_row: pd.Series = None, ma
             }
         ],
         "status": encounter_status,
-        "class": {
-            "system": "http://terminology.hl7.org/CodeSystem/v3-ActCode",
-            "code": "AMB",
-            "display": "ambulatory"
-        }
+        "class": encounter_class
     }
     
     # Add subject (patient reference)
@@ -236,9 +309,9 @@ def map_claim_to_fhir(claim_row: pd.Series, member_row: pd.Series = None, provid
     Map a claim row to a minimal FHIR Claim resource.
     
     Args:
-        claim_row: Pandas Series with claim data
-        member_row: Optional Pandas Series with member data
-        provider_row: Optional Pandas Series with provider data
+        claim_row: Claim record (pandas Series or dict)
+        member_row: Optional member record (pandas Series or dict)
+        provider_row: Optional provider record (pandas Series or dict)
         mapping_config: Optional custom mapping configuration
     
     Returns:
@@ -250,20 +323,25 @@ def map_claim_to_fhir(claim_row: pd.Series, member_row: pd.Series = None, provid
     member_id = _safe_str(claim_row.get("member_id"))
     provider_id = _safe_str(claim_row.get("provider_id"))
     claim_amount = _safe_float(claim_row.get("claim_amount"))
-    service_date = _safe_str(claim_row.get("service_date"))
+    service_date = _safe_date(claim_row.get("service_date"))
     icd_code = _safe_str(claim_row.get("icd_code"))
     cpt_code = _safe_str(claim_row.get("cpt_code"))
     claim_status = _safe_str(claim_row.get("claim_status"))
     
     # Map claim status to FHIR status
-    status_map = {
-        "PAID": "active",
-        "DENIED": "cancelled",
-        "PENDING": "draft",
-        "APPEALED": "draft"
-    }
-    fhir_status = status_map.get(claim_status, "draft") if claim_status else "draft"
+    fhir_status = CLAIM_STATUS_MAP.get(claim_status, "draft") if claim_status else "draft"
     
+    return _claim_resource(
+        config, date.today().isoformat(), _claim_type(), claim_id, member_id, provider_id,
+        claim_amount, service_date, icd_code, cpt_code, fhir_status
+    )
+
+
+def _claim_resource(
+    config, today_iso, claim_type, claim_id, member_id, provider_id, claim_amount,
+    service_date, icd_code, cpt_code, fhir_status
+) -> Dict:
+    """Assemble a Claim resource from already-normalized field values and a Claim.type."""
     claim = {
         "resourceType": "Claim",
         "id": claim_id,
@@ -274,17 +352,9 @@ def map_claim_to_fhir(claim_row: pd.Series, member_row: pd.Series = None, provid
             }
         ],
         "status": fhir_status,
-        "type": {
-            "coding": [
-                {
-                    "system": "http://terminology.hl7.org/CodeSystem/claim-type",
-                    "code": "professional",
-                    "display": "Professional"
-                }
-            ]
-        },
+        "type": claim_type,
         "use": "claim",
-        "created": service_date or datetime.now().strftime("%Y-%m-%d")
+        "created": service_date or today_iso
     }
     
     # Add patient reference
@@ -333,10 +403,14 @@ def map_claim_to_fhir(claim_row: pd.Series, member_row: pd.Series = None, provid
     
     # Add total
     if claim_amount is not None:
-        claim["total"] = {
-            "value": claim_amount,
-            "currency": "USD"
-        }
+        claim["total"] = {"value": claim_amount, "currency": "USD"}
+    
+    # Line item price, built once per claim and used for unitPrice and net;
+    # missing amounts are priced at 0
+    if claim_amount:
+        price = {"value": claim_amount, "currency": "USD"}
+    else:
+        price = {"value": 0, "currency": "USD"}
     
     # Add billable period
     if service_date:
@@ -358,31 +432,153 @@ def map_claim_to_fhir(claim_row: pd.Series, member_row: pd.Series = None, provid
                 ]
             },
             "servicedDate": service_date,
-            "unitPrice": {
-                "value": claim_amount or 0,
-                "currency": "USD"
-            },
-            "net": {
-                "value": claim_amount or 0,
-                "currency": "USD"
-            }
+            "unitPrice": price,
+            "net": price
         }
     ]
     
     return claim
 
 
+def _str_values(df: pd.DataFrame, column: str) -> np.ndarray:
+    """Column as an object array of str, with None for missing values (column-wise _safe_str)."""
+    if column not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    values = df[column]
+    return values.map(str, na_action="ignore").astype(object).where(values.notna(), None).to_numpy()
+
+
+def _date_values(df: pd.DataFrame, column: str) -> np.ndarray:
+    """Column as an object array of YYYY-MM-DD strings (column-wise _safe_date)."""
+    if column in df.columns and pd.api.types.is_datetime64_any_dtype(df[column]):
+        values = df[column].dt.strftime("%Y-%m-%d")
+        return values.astype(object).where(values.notna(), None).to_numpy()
+    return _str_values(df, column)
+
+
+def _float_values(df: pd.DataFrame, column: str) -> np.ndarray:
+    """Column as an object array of float, with None for missing or unparsable values."""
+    if column not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    values = pd.to_numeric(df[column], errors="coerce").astype("float64")
+    return values.astype(object).where(values.notna(), None).to_numpy()
+
+
+def _status_values(df: pd.DataFrame, status_map: dict, default: str) -> np.ndarray:
+    """Map claim_status to FHIR status codes for the whole column at once."""
+    if "claim_status" not in df.columns:
+        return np.full(len(df), default, dtype=object)
+    # Categorical codes index straight into the mapped values; unmapped and
+    # missing statuses get code -1, which picks the trailing default
+    codes = pd.Categorical(df["claim_status"], categories=list(status_map)).codes
+    lookup = np.array([*status_map.values(), default], dtype=object)
+    return lookup[codes]
+
+
+def build_claim_resources(claims_df: pd.DataFrame, mapping_config: dict = None) -> List[Dict]:
+    """
+    Map every claim row to a FHIR Claim resource in one column-wise pass.
+    
+    Produces the same resources as calling map_claim_to_fhir per row, but
+    normalizes each field once per column instead of once per claim. The
+    constant Claim.type subtree is shared by all returned resources, so treat
+    them as read-only (use map_claim_to_fhir for resources to modify).
+    
+    Args:
+        claims_df: DataFrame with claims data
+        mapping_config: Optional custom mapping configuration
+    
+    Returns:
+        List of Claim resources, aligned with the rows of claims_df
+    """
+    config = mapping_config or DEFAULT_SYSTEMS
+    # Fallback "created" date for claims without a service date, read once per batch
+    today_iso = date.today().isoformat()
+    columns = zip(
+        _str_values(claims_df, "claim_id"),
+        _str_values(claims_df, "member_id"),
+        _str_values(claims_df, "provider_id"),
+        _float_values(claims_df, "claim_amount"),
+        _date_values(claims_df, "service_date"),
+        _str_values(claims_df, "icd_code"),
+        _str_values(claims_df, "cpt_code"),
+        _status_values(claims_df, CLAIM_STATUS_MAP, "draft"),
+    )
+    return [_claim_resource(config, today_iso, _CLAIM_TYPE, *fields) for fields in columns]
+
+
+def build_encounter_resources(claims_df: pd.DataFrame) -> List[Dict]:
+    """
+    Map every claim row to a FHIR Encounter resource in one column-wise pass.
+    
+    The constant Encounter.class subtree is shared by all returned resources,
+    so treat them as read-only.
+    
+    Args:
+        claims_df: DataFrame with claims data
+    
+    Returns:
+        List of Encounter resources, aligned with the rows of claims_df
+    """
+    columns = zip(
+        _str_values(claims_df, "claim_id"),
+        _str_values(claims_df, "member_id"),
+        _str_values(claims_df, "provider_id"),
+        _date_values(claims_df, "service_date"),
+        _status_values(claims_df, ENCOUNTER_STATUS_MAP, "unknown"),
+    )
+    return [_encounter_resource(_ENCOUNTER_CLASS, *fields) for fields in columns]
+
+
+def _write_json(path: Path, resource: dict) -> None:
+    """Write one FHIR resource as indented JSON."""
+    # Serialize in memory and write with a single call
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(resource, option=orjson.OPT_INDENT_2))
+    else:
+        path.write_bytes(json.dumps(resource, indent=2).encode("utf-8"))
+
+
+def _ndjson_line(resource: dict) -> bytes:
+    """Serialize one FHIR resource as a compact, newline-terminated JSON line."""
+    if orjson is not None:
+        return orjson.dumps(resource, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(resource, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _unique_ids(ids: np.ndarray) -> np.ndarray:
+    """Distinct non-empty IDs in order of first appearance."""
+    return pd.unique(ids[pd.notna(ids) & (ids != "")])
+
+
+def _index_records(df: Optional[pd.DataFrame], key: str, fields: List[str]) -> Dict[Any, dict]:
+    """Build a key -> record dict lookup table from the given fields of a DataFrame."""
+    # Missing silver tables arrive as None or a column-less empty frame
+    if df is None or key not in df.columns:
+        return {}
+    columns = [c for c in fields if c in df.columns]
+    return {record[key]: record for record in df[columns].to_dict(orient="records")}
+
+
 def export_fhir_resources(
     claims_df: pd.DataFrame, 
     providers_df: pd.DataFrame, 
     members_df: pd.DataFrame, 
     out_dir: str = "data/fhir",
     mapping_config: dict = None,
-    max_claims: int = None
+    max_claims: int = None,
+    per_file: bool = False
 ) -> Dict[str, int]:
     """
     Export claims, providers, and members to FHIR JSON resources.
     
+    By default each resource type is written as one NDJSON bundle
+    (<out_dir>/<ResourceType>.ndjson, one resource per line), the layout
+    used by FHIR bulk export. With per_file=True every resource gets its
+    own <out_dir>/<ResourceType>/<id>.json file instead. Both layouts hold
+    the same resources: one per distinct claim ID (the last row wins) and
+    one per referenced patient and practitioner.
+    
     Args:
         claims_df: DataFrame with claims data
         providers_df: DataFrame with providers data
@@ -390,6 +586,7 @@ def export_fhir_resources(
         out_dir: Output directory for FHIR resources
         mapping_config: Optional custom mapping configuration
         max_claims: Maximum number of claims to export (None for all)
+        per_file: Write one JSON file per resource instead of NDJSON bundles
     
     Returns:
         Dictionary with counts of exported resources
@@ -397,73 +594,88 @@ def export_fhir_resources(
     out_path = Path(out_dir)
     out_path.mkdir(parents=True, exist_ok=True)
     
-    # Create subdirectories
-    (out_path / "Patient").mkdir(exist_ok=True)
-    (out_path / "Practitioner").mkdir(exist_ok=True)
-    (out_path / "Claim").mkdir(exist_ok=True)
-    (out_path / "Encounter").mkdir(exist_ok=True)
-    
-    # Index providers and members for lookup
-    providers_dict = {}
-    if providers_df is not None and len(providers_df) > 0:
-        providers_dict = {row["provider_id"]: row for _, row in providers_df.iterrows()}
+    resource_types = ["Patient", "Practitioner", "Claim", "Encounter"]
+    resource_dirs = {resource_type: out_path / resource_type for resource_type in resource_types}
+    if per_file:
+        # Create subdirectories
+        for resource_dir in resource_dirs.values():
+            resource_dir.mkdir(exist_ok=True)
     
-    members_dict = {}
-    if members_df is not None and len(members_df) > 0:
-        members_dict = {row["member_id"]: row for _, row in members_df.iterrows()}
+    # Index providers and members for lookup as plain dicts of the fields the
+    # mappers read (on repeated IDs the last row wins)
+    providers_dict = _index_records(providers_df, "provider_id", PRACTITIONER_FIELDS)
+    members_dict = _index_records(members_df, "member_id", PATIENT_FIELDS)
     
     # Track exported resources
-    exported_patients = set()
-    exported_practitioners = set()
-    counts = {"Patient": 0, "Practitioner": 0, "Claim": 0, "Encounter": 0}
+    counts = {resource_type: 0 for resource_type in resource_types}
     
     # Limit claims if specified
     claims_to_export = claims_df.head(max_claims) if max_claims else claims_df
     
     print(f"Exporting FHIR resources to {out_path}...")
     
-    for idx, claim_row in claims_to_export.iterrows():
-        claim_id = _safe_str(claim_row.get("claim_id"))
-        member_id = _safe_str(claim_row.get("member_id"))
-        provider_id = _safe_str(claim_row.get("provider_id"))
+    with ExitStack() as stack:
+        if per_file:
+            # Resources are built here and written on a thread pool so file
+            # I/O overlaps with mapping the next claims
+            max_workers = min(32, (os.cpu_count() or 1) * 4)
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=max_workers))
+            futures = []
+        else:
+            bundles = {
+                resource_type: stack.enter_context(
+                    open(out_path / f"{resource_type}.ndjson", "wb", buffering=1 << 20)
+                )
+                for resource_type in resource_types
+            }
         
-        if not claim_id:
-            continue
+        def emit(resource_type: str, file_name: str, resource: dict) -> None:
+            if per_file:
+                futures.append(executor.submit(_write_json, resource_dirs[resource_type] / file_name, resource))
+            else:
+                bundles[resource_type].write(_ndjson_line(resource))
+            counts[resource_type] += 1
         
-        # Export Patient (if not already exported)
-        if member_id and member_id not in exported_patients:
+        # Only claims with an ID are exported, along with their patients and
+        # practitioners. On repeated claim IDs the last row wins, so each
+        # Claim/Encounter is built and written exactly once (no two writers
+        # ever target the same per-file path)
+        claim_ids = _str_values(claims_to_export, "claim_id")
+        exportable = pd.notna(claim_ids) & (claim_ids != "")
+        exportable &= ~pd.Series(claim_ids).duplicated(keep="last").to_numpy()
+        claims_to_export = claims_to_export[exportable]
+        
+        # Export each referenced Patient and Practitioner once, up front
+        for member_id in _unique_ids(_str_values(claims_to_export, "member_id")):
             member_row = members_dict.get(member_id)
             if member_row is not None:
                 patient = map_patient_to_fhir(member_row, mapping_config=mapping_config)
-                with open(out_path / "Patient" / f"{member_id}.json", "w") as f:
-                    json.dump(patient, f, indent=2)
-                exported_patients.add(member_id)
-                counts["Patient"] += 1
+                emit("Patient", f"{member_id}.json", patient)
         
-        # Export Practitioner (if not already exported)
-        if provider_id and provider_id not in exported_practitioners:
+        for provider_id in _unique_ids(_str_values(claims_to_export, "provider_id")):
             provider_row = providers_dict.get(provider_id)
             if provider_row is not None:
                 practitioner = map_practitioner_to_fhir(provider_row, mapping_config=mapping_config)
-                with open(out_path / "Practitioner" / f"{provider_id}.json", "w") as f:
-                    json.dump(practitioner, f, indent=2)
-                exported_practitioners.add(provider_id)
-                counts["Practitioner"] += 1
-        
-        # Export Claim
-        member_row = members_dict.get(member_id) if member_id else None
-        provider_row = providers_dict.get(provider_id) if provider_id else None
+                emit("Practitioner", f"{provider_id}.json", practitioner)
         
-        claim = map_claim_to_fhir(claim_row, member_row, provider_row, mapping_config)
-        with open(out_path / "Claim" / f"{claim_id}.json", "w") as f:
-            json.dump(claim, f, indent=2)
-        counts["Claim"] += 1
+        # Claim and Encounter resources are built column-wise
+        rows = zip(
+            build_claim_resources(claims_to_export, mapping_config),
+            build_encounter_resources(claims_to_export),
+        )
+        for claim, encounter in rows:
+            claim_id = claim["id"]
+            
+            # Export Claim
+            emit("Claim", f"{claim_id}.json", claim)
+            
+            # Export Encounter
+            emit("Encounter", f"enc-{claim_id}.json", encounter)
         
-        # Export Encounter
-        encounter = map_encounter_to_fhir(claim_row, member_row, mapping_config)
-        with open(out_path / "Encounter" / f"enc-{claim_id}.json", "w") as f:
-            json.dump(encounter, f, indent=2)
-        counts["Encounter"] += 1
+        if per_file:
+            # Surface any write errors
+            for future in futures:
+                future.result()
     
     print(f"\nExport complete:")
     for resource_type, count in counts.items():
@@ -491,7 +703,8 @@ if __name__ == "__main__":
         providers_df, 
         members_df,
         out_dir="data/fhir",
-        max_claims=100
+        max_claims=100,
+        per_file=True
     )
     
     # Show sample output
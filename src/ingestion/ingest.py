@@ -1,6 +1,14 @@
+import os
 import pandas as pd
 from pathlib import Path
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
 # Required columns for each file type
 REQUIRED_COLUMNS = {
     "claims": ["claim_id", "member_id", "provider_id", "claim_amount", "service_date", "icd_code", "cpt_code", "claim_status"],
@@ -8,22 +16,61 @@ REQUIRED_COLUMNS = {
     "members": ["member_id", "first_name", "last_name", "dob", "gender", "plan_type"]
 }
 
-def validate_columns(df: pd.DataFrame, file_type: str) -> bool:
-    """Validate that required columns are present in the DataFrame."""
+# Date columns stay raw strings in bronze; transform parses them
+DATE_COLUMNS = ["service_date", "dob"]
+
+# ID and code columns stay strings even when every value looks numeric (e.g.
+# CPT 99213); inferred as int64 they would lose leading zeros and break the
+# string validation in transform
+STRING_COLUMNS = ["claim_id", "member_id", "provider_id", "icd_code", "cpt_code"]
+
+# Low-cardinality columns stored dictionary-encoded in bronze Parquet
+DICTIONARY_COLUMNS = ["claim_status", "icd_code", "cpt_code", "specialty", "state", "gender", "plan_type"]
+
+def validate_columns(df, file_type: str) -> bool:
+    """Validate that required columns are present in a DataFrame or list of column names."""
+    columns = df.columns if isinstance(df, pd.DataFrame) else df
     required = REQUIRED_COLUMNS.get(file_type, [])
-    missing = set(required) - set(df.columns)
+    missing = set(required) - set(columns)
     if missing:
         print(f"Warning: {file_type} missing required columns: {missing}")
         return False
     return True
 
-def run_ingest(input_dir="data", output_dir="data/bronze"):
+# Rows per chunk when streaming without pyarrow
+PANDAS_CHUNK_ROWS = 100_000
+
+# Bytes per CSV block read by the Arrow streaming reader
+CSV_BLOCK_SIZE = 1 << 24
+
+def open_csv_batches(csv_file: Path) -> "pacsv.CSVStreamingReader":
     """
-    Ingest CSV files and write to parquet format in bronze layer.
+    Open a CSV as a stream of Arrow record batches.
+    
+    Empty fields become nulls as with pd.read_csv. Date, ID and code columns
+    are read as strings; the other column types are inferred from the first
+    block (CSV_BLOCK_SIZE bytes).
+    """
+    convert_options = pacsv.ConvertOptions(
+        column_types={col: pa.string() for col in DATE_COLUMNS + STRING_COLUMNS},
+        strings_can_be_null=True,
+    )
+    return pacsv.open_csv(
+        csv_file,
+        read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=convert_options,
+    )
+
+def run_ingest(input_dir="data", output_dir="data/bronze", force: bool = False):
+    """
+    Ingest CSV (or Parquet) source files and write to parquet format in bronze layer.
+    
+    When both <name>.csv and <name>.parquet exist, the newer one is ingested.
     
     Args:
-        input_dir: Directory containing source CSV files
+        input_dir: Directory containing source CSV or Parquet files
         output_dir: Directory to write parquet files (bronze layer)
+        force: Re-ingest sources whose bronze output is newer than the source file
     
     Returns:
         Dictionary mapping file type to output path
@@ -37,30 +84,79 @@ def run_ingest(input_dir="data", output_dir="data/bronze"):
     
     for file_type in files_to_ingest:
         csv_file = input_path / f"{file_type}.csv"
+        parquet_source = input_path / f"{file_type}.parquet"
         
-        if not csv_file.exists():
+        if not csv_file.exists() and not parquet_source.exists():
             print(f"Warning: {csv_file} not found, skipping...")
             continue
         
-        # Read CSV
-        print(f"Reading {csv_file}...")
-        df = pd.read_csv(csv_file)
-        print(f"  Loaded {len(df)} rows, {len(df.columns)} columns")
+        # Use the newer of the two sources (Parquet on a tie), so a CSV left over
+        # from an earlier --csv run never shadows freshly generated Parquet
+        candidates = [f for f in (parquet_source, csv_file) if f.exists()]
+        source = max(candidates, key=lambda f: f.stat().st_mtime)
+        
+        # Incremental: bronze files are only ever published complete (see the
+        # temp file below), so one written after its source is kept as is and
+        # the transform step can skip it too
+        output_file = output_path / f"{file_type}.{'parquet' if pa is not None else 'csv'}"
+        if not force and output_file.exists() and output_file.stat().st_mtime >= source.stat().st_mtime:
+            print(f"Skipping {source} (bronze up to date)")
+            output_paths[file_type] = str(output_file)
+            continue
         
-        # Validate columns
-        validate_columns(df, file_type)
+        print(f"Reading {source}...")
         
-        # Try to write parquet, fallback to CSV
+        # Written to a temp file next to the output and renamed into place only
+        # once complete, so an interrupted ingest never leaves a partial bronze
+        # file that a later run would take as up to date
+        tmp_file = output_file.with_name(f"{output_file.name}.tmp")
         try:
-            import pyarrow
-            output_file = output_path / f"{file_type}.parquet"
-            df.to_parquet(output_file, index=False, engine="pyarrow")
-            print(f"  Written to {output_file}")
-        except ImportError:
-            print("  pyarrow not available, falling back to CSV")
-            output_file = output_path / f"{file_type}.csv"
-            df.to_csv(output_file, index=False)
-            print(f"  Written to {output_file}")
+            if pa is not None:
+                # Stream the CSV or Parquet source batch by batch into one Parquet
+                # writer: peak memory stays at one batch regardless of file size
+                # and there is no pandas round-trip
+                if source == csv_file:
+                    reader = open_csv_batches(csv_file)
+                    schema, batches = reader.schema, reader
+                else:
+                    parquet_file = pq.ParquetFile(parquet_source)
+                    schema, batches = parquet_file.schema_arrow, parquet_file.iter_batches()
+                
+                # Validate columns
+                validate_columns(schema.names, file_type)
+                
+                n_rows = 0
+                # Dictionary pages + ZSTD keep repetitive columns small; the column
+                # types are unchanged, so readers still get plain strings back
+                with pq.ParquetWriter(
+                    tmp_file, schema,
+                    compression="zstd", compression_level=3,
+                    use_dictionary=[c for c in DICTIONARY_COLUMNS if c in schema.names],
+                    data_page_size=1 << 20,
+                ) as writer:
+                    for batch in batches:
+                        writer.write_batch(batch)
+                        n_rows += batch.num_rows
+                print(f"  Loaded {n_rows} rows, {len(schema.names)} columns")
+            else:
+                print("  pyarrow not available, falling back to CSV")
+                if source == csv_file:
+                    chunks = pd.read_csv(csv_file, chunksize=PANDAS_CHUNK_ROWS)
+                else:
+                    chunks = [pd.read_parquet(parquet_source)]
+                
+                n_rows = 0
+                for i, df in enumerate(chunks):
+                    if i == 0:
+                        # Validate columns
+                        validate_columns(df, file_type)
+                    df.to_csv(tmp_file, index=False, mode="w" if i == 0 else "a", header=i == 0)
+                    n_rows += len(df)
+                print(f"  Loaded {n_rows} rows")
+            os.replace(tmp_file, output_file)
+        finally:
+            tmp_file.unlink(missing_ok=True)
+        print(f"  Written to {output_file}")
         
         output_paths[file_type] = str(output_file)
     
@@ -0,0 +1,61 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Rows per Parquet row group (and per converted RecordBatch)
+DEFAULT_ROW_GROUP_SIZE = 128 * 1024
+
+
+def write_parquet_chunked(df: pd.DataFrame, path, row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                          metadata: dict = None):
+    """
+    Write a DataFrame to ZSTD Parquet one row group at a time.
+    
+    The Arrow schema is inferred once from the whole frame; each slice is
+    then converted to a RecordBatch and written, so only one row group's
+    Arrow copy is alive at a time. Rows go to a temp file next to path that
+    is renamed onto path once complete, so path never holds a partial file.
+    
+    Args:
+        df: DataFrame to write (index is dropped)
+        path: Output Parquet file
+        row_group_size: Rows per row group
+        metadata: Extra key/value pairs stored in the file's schema metadata
+    """
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    if metadata:
+        schema = schema.with_metadata({**schema.metadata, **metadata})
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    try:
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd", compression_level=3) as writer:
+            for start in range(0, len(df), row_group_size):
+                chunk = df.iloc[start:start + row_group_size]
+                writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def read_parquet_mapped(path, columns=None, filters=None, types_mapper=None) -> pd.DataFrame:
+    """
+    Read a local Parquet file into a DataFrame through a memory map.
+    
+    Column chunks are decoded on Arrow's thread pool straight from the
+    mapped file, which pd.read_parquet does not do for local paths since it
+    hands pyarrow an open file handle.
+    
+    Args:
+        path: Parquet file
+        columns: Columns to read (None for all)
+        filters: Row filters in pyarrow's DNF form, pushed down to row groups
+        types_mapper: Optional Arrow -> pandas dtype mapping (e.g. pd.ArrowDtype)
+    
+    Returns:
+        DataFrame with the pandas metadata (dtypes, categoricals) restored
+    """
+    table = pq.read_table(path, columns=columns, filters=filters, use_threads=True, memory_map=True)
+    return table.to_pandas(types_mapper=types_mapper)
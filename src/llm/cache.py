@@ -0,0 +1,32 @@
+import json
+import os
+from pathlib import Path
+
+# Default location of the persistent LLM explanation cache
+DEFAULT_CACHE_FILE = Path("data/cache/llm_explanations.json")
+
+
+class ExplanationCache(dict):
+    """
+    Flag fingerprint -> LLM explanation map persisted as a JSON file.
+    
+    LLM explanations are generated from the flag set alone (claim IDs and
+    amounts are filled in per record), so entries are keyed on the sorted
+    flags rather than on claim_id and stay valid across pipeline runs.
+    """
+    
+    def __init__(self, path=DEFAULT_CACHE_FILE):
+        super().__init__()
+        self.path = Path(path)
+        if self.path.exists():
+            try:
+                self.update(json.loads(self.path.read_text(encoding="utf-8")))
+            except (OSError, ValueError, TypeError) as e:
+                print(f"Ignoring unreadable explanation cache {self.path}: {e}")
+    
+    def save(self):
+        """Write the cache atomically so an interrupted run never corrupts it."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.path)
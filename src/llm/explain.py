@@ -1,6 +1,23 @@
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Optional
 
+import pandas as pd
+
+try:
+    from openai import OpenAI, RateLimitError
+except ImportError:
+    OpenAI = None
+
+# Concurrent OpenAI requests in explain_batch
+EXPLAIN_MAX_WORKERS = 8
+
+# Retries (with exponential backoff) when the API reports a rate limit
+OPENAI_MAX_RETRIES = 3
+
 
 # Flag descriptions for fallback explanations
 FLAG_DESCRIPTIONS = {
@@ -34,64 +51,89 @@ FLAG_REMEDIATIONS = {
     "missing_provider": "Obtain and add the provider NPI/ID before processing this claim.",
 }
 
+# Combined flag -> (description, remediation) lookup, keyed on lowercase flag names
+FLAG_INFO = {
+    flag: (description, FLAG_REMEDIATIONS.get(flag))
+    for flag, description in FLAG_DESCRIPTIONS.items()
+}
 
-def build_prompt(record: dict) -> str:
-    """Build a prompt for the LLM based on the anomaly record."""
-    claim_id = record.get("claim_id", "Unknown")
-    claim_amount = record.get("claim_amount", "N/A")
-    provider_id = record.get("provider_id", "N/A")
-    member_id = record.get("member_id", "N/A")
-    service_date = record.get("service_date", "N/A")
-    icd_code = record.get("icd_code", "N/A")
-    cpt_code = record.get("cpt_code", "N/A")
-    
-    # Get flags from various possible field names
+
+_WHITESPACE_RUN = re.compile(r"[ \t]+|\n{2,}")
+
+
+def _squeeze(template: str) -> str:
+    """Collapse runs of spaces and blank lines so prompts spend fewer input tokens."""
+    return _WHITESPACE_RUN.sub(lambda m: "\n" if m.group().startswith("\n") else " ", template).strip()
+
+
+# Prompt template, whitespace-squeezed once at import
+_FLAGS_PROMPT_TEMPLATE = _squeeze("""
+You are a healthcare claims analyst. A claim was flagged with: {flags_text}.
+
+Provide a 2-sentence explanation of why a claim with these flags was flagged, followed by 1 specific remediation suggestion.
+Refer to it as "this claim". Keep the response concise and actionable.
+""")
+
+
+def _record_flags(record: dict) -> list:
+    """Get the anomaly flags of a record from the various possible field names."""
     flags = record.get("flags", [])
     if not flags:
         flags_str = record.get("flags_list", "") or record.get("anomaly_reasons_str", "")
         if flags_str:
-            flags = flags_str.split(",")
-    
-    flags_text = ", ".join(flags) if flags else "Unknown"
-    
-    prompt = f"""You are a healthcare claims analyst. Analyze this flagged claim and provide a brief explanation.
+            flags = [f.strip() for f in flags_str.split(",") if f.strip()]
+    return flags
 
-Claim Details:
-- Claim ID: {claim_id}
-- Claim Amount: ${claim_amount}
-- Provider ID: {provider_id}
-- Member ID: {member_id}
-- Service Date: {service_date}
-- ICD-10 Code: {icd_code}
-- CPT Code: {cpt_code}
-- Flags: {flags_text}
 
-Provide a 2-sentence explanation of why this claim was flagged, followed by 1 specific remediation suggestion.
-Keep the response concise and actionable."""
+def _format_amount(amount) -> str:
+    """Claim amount as "$<amount>", or "N/A" when it is missing (None, NaN, <NA>)."""
+    if amount is None or (pd.api.types.is_scalar(amount) and pd.isna(amount)):
+        return "N/A"
+    return f"${amount}"
 
-    return prompt
+
+@lru_cache(maxsize=1)
+def _openai_client(api_key: str):
+    """
+    Create the OpenAI client once per API key so its connection pool is reused.
+    
+    The SDK's own retries are disabled; call_openai's backoff loop is the only
+    retry mechanism, so attempts do not multiply.
+    """
+    return OpenAI(api_key=api_key, max_retries=0)
+
+
+def _get_client():
+    """Return the shared OpenAI client, or None if openai or the API key is unavailable."""
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if OpenAI is None or not api_key:
+        return None
+    return _openai_client(api_key)
 
 
 def call_openai(prompt: str) -> Optional[str]:
     """Call OpenAI API to get explanation."""
     try:
-        from openai import OpenAI
-        
-        api_key = os.environ.get("OPENAI_API_KEY")
-        if not api_key:
+        client = _get_client()
+        if client is None:
             return None
         
-        client = OpenAI(api_key=api_key)
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a healthcare claims analyst providing brief, actionable explanations."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.3
-        )
+        for attempt in range(OPENAI_MAX_RETRIES + 1):
+            try:
+                response = client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {"role": "system", "content": "You are a healthcare claims analyst providing brief, actionable explanations."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=200,
+                    temperature=0.3
+                )
+                break
+            except RateLimitError:
+                if attempt == OPENAI_MAX_RETRIES:
+                    raise
+                time.sleep(2 ** attempt)
         
         return response.choices[0].message.content.strip()
     
@@ -100,42 +142,86 @@ def call_openai(prompt: str) -> Optional[str]:
         return None
 
 
+def build_flags_prompt(flags: tuple) -> str:
+    """Build a claim-independent prompt that explains a set of anomaly flags."""
+    return _FLAGS_PROMPT_TEMPLATE.format(flags_text=", ".join(flags) if flags else "Unknown")
+
+
+@lru_cache(maxsize=1024)
+def _explain_flags(flags: tuple) -> tuple:
+    """
+    Build the flag-dependent parts of a fallback explanation.
+    
+    Returns:
+        (descriptions joined with "; " or None if no flag is known, remediation text)
+    """
+    explanations = []
+    remediations = []
+    
+    for flag_lower in flags:
+        info = FLAG_INFO.get(flag_lower)
+        if info is not None:
+            explanations.append(info[0])
+            if info[1]:
+                remediations.append(info[1])
+    
+    if remediations:
+        remediation_text = f" Recommended action: {remediations[0]}"
+    else:
+        remediation_text = " Please review this claim manually and verify all details."
+    
+    return ("; ".join(explanations) if explanations else None), remediation_text
+
+
+# LLM explanations by flag fingerprint; failed calls are not cached. Swap in a
+# persistent ExplanationCache with use_explanation_cache to reuse them across runs
+_llm_explanations = {}
+
+
+def flags_fingerprint(flags) -> str:
+    """Order-insensitive cache key for a set of anomaly flags."""
+    return ",".join(sorted(set(flags)))
+
+
+def use_explanation_cache(cache: Optional[dict]) -> None:
+    """Store LLM explanations in cache (e.g. an ExplanationCache), or in memory only if None."""
+    global _llm_explanations
+    _llm_explanations = cache if cache is not None else {}
+
+
+def _normalized_flags(record: dict) -> tuple:
+    """Lower-cased, trimmed anomaly flags of a record."""
+    return tuple(flag.lower().strip() for flag in _record_flags(record))
+
+
+def _llm_explain_flags(flags: tuple) -> Optional[str]:
+    """Get an LLM explanation for a flag set, calling OpenAI once per distinct set."""
+    key = flags_fingerprint(flags)
+    explanation = _llm_explanations.get(key)
+    if explanation is None:
+        explanation = call_openai(build_flags_prompt(flags))
+        if explanation:
+            _llm_explanations[key] = explanation
+    return explanation
+
+
 def generate_fallback_explanation(record: dict) -> str:
     """Generate a deterministic explanation without LLM."""
     claim_id = record.get("claim_id", "Unknown")
-    claim_amount = record.get("claim_amount", "N/A")
-    
-    # Get flags from various possible field names
-    flags = record.get("flags", [])
-    if not flags:
-        flags_str = record.get("flags_list", "") or record.get("anomaly_reasons_str", "")
-        if flags_str:
-            flags = [f.strip() for f in flags_str.split(",") if f.strip()]
+    claim_amount = _format_amount(record.get("claim_amount"))
     
+    flags = _record_flags(record)
     if not flags:
         return f"Claim {claim_id} was flagged for review but no specific anomaly type was recorded. Please review manually."
     
-    # Build explanation from flags
-    explanations = []
-    remediations = []
-    
-    for flag in flags:
-        flag_lower = flag.lower().strip()
-        if flag_lower in FLAG_DESCRIPTIONS:
-            explanations.append(FLAG_DESCRIPTIONS[flag_lower])
-        if flag_lower in FLAG_REMEDIATIONS:
-            remediations.append(FLAG_REMEDIATIONS[flag_lower])
+    # Only the claim header depends on the record; the rest is cached per flag set
+    explanations_text, remediation_text = _explain_flags(tuple(flag.lower().strip() for flag in flags))
     
     # Compose final explanation
-    if explanations:
-        explanation_text = f"Claim {claim_id} (${claim_amount}) was flagged due to: {'; '.join(explanations)}."
+    if explanations_text:
+        explanation_text = f"Claim {claim_id} ({claim_amount}) was flagged due to: {explanations_text}."
     else:
-        explanation_text = f"Claim {claim_id} (${claim_amount}) was flagged for: {', '.join(flags)}."
-    
-    if remediations:
-        remediation_text = f" Recommended action: {remediations[0]}"
-    else:
-        remediation_text = " Please review this claim manually and verify all details."
+        explanation_text = f"Claim {claim_id} ({claim_amount}) was flagged for: {', '.join(flags)}."
     
     return explanation_text + remediation_text
 
@@ -145,7 +231,13 @@ def explain_anomaly(record: dict) -> str:
     Generate an explanation for an anomalous claim.
     
     Uses OpenAI API if OPENAI_API_KEY is set, otherwise falls back to
-    deterministic explanation based on flags.
+    deterministic explanation based on flags. Both are memoized per flag
+    set, so repeated anomaly patterns cost a single API call.
+    
+    LLM explanations are deliberately per flag set: the prompt holds only the
+    anomaly flags, so the model never sees the claim's amount, ICD or CPT
+    code, and every claim with the same flags gets the same text behind its
+    own "Claim <id> (<amount>):" header.
     
     Args:
         record: Dictionary containing claim details and flags
@@ -153,17 +245,60 @@ def explain_anomaly(record: dict) -> str:
     Returns:
         String explanation with remediation suggestion
     """
-    # Try OpenAI first if API key is available
+    # Try OpenAI first if API key is available; the LLM explains the flag set
+    # (cached across claims) and the claim header is filled in here
     if os.environ.get("OPENAI_API_KEY"):
-        prompt = build_prompt(record)
-        llm_response = call_openai(prompt)
+        llm_response = _llm_explain_flags(_normalized_flags(record))
         if llm_response:
-            return llm_response
+            return _with_claim_header(record, llm_response)
     
     # Fallback to deterministic explanation
     return generate_fallback_explanation(record)
 
 
+def _with_claim_header(record: dict, llm_response: str) -> str:
+    """Prefix a flag-set LLM explanation with the claim it is shown for."""
+    claim_id = record.get("claim_id", "Unknown")
+    return f"Claim {claim_id} ({_format_amount(record.get('claim_amount'))}): {llm_response}"
+
+
+def explain_records(records: list, max_workers: int = EXPLAIN_MAX_WORKERS) -> list:
+    """
+    Explain records in order, calling the LLM at most once per distinct flag set.
+    
+    Same result as explain_anomaly per record. The distinct flag fingerprints
+    are resolved concurrently first, so records sharing a flag set never race
+    each other to the API (or retry a failed call once per record).
+    
+    Args:
+        records: List of dictionaries containing claim details and flags
+        max_workers: Maximum concurrent OpenAI requests
+    
+    Returns:
+        List of explanation strings aligned with records
+    """
+    if not os.environ.get("OPENAI_API_KEY"):
+        return [generate_fallback_explanation(record) for record in records]
+    
+    flags = [_normalized_flags(record) for record in records]
+    distinct = {}
+    for record_flags in flags:
+        distinct.setdefault(flags_fingerprint(record_flags), record_flags)
+    
+    # Overlap the (network-bound) OpenAI round-trips; cached flag sets return at once
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(distinct)))) as executor:
+        responses = dict(zip(distinct, executor.map(_llm_explain_flags, distinct.values())))
+    
+    explanations = []
+    for record, record_flags in zip(records, flags):
+        llm_response = responses[flags_fingerprint(record_flags)]
+        if llm_response:
+            explanations.append(_with_claim_header(record, llm_response))
+        else:
+            explanations.append(generate_fallback_explanation(record))
+    return explanations
+
+
 def explain_batch(records: list, max_records: int = 10) -> list:
     """
     Generate explanations for a batch of anomalous claims.
@@ -175,14 +310,16 @@ def explain_batch(records: list, max_records: int = 10) -> list:
     Returns:
         List of explanation strings
     """
-    explanations = []
-    for i, record in enumerate(records[:max_records]):
-        explanation = explain_anomaly(record)
-        explanations.append({
+    batch = records[:max_records]
+    results = explain_records(batch)
+    
+    return [
+        {
             "claim_id": record.get("claim_id", f"record_{i}"),
             "explanation": explanation
-        })
-    return explanations
+        }
+        for i, (record, explanation) in enumerate(zip(batch, results))
+    ]
 
 
 if __name__ == "__main__":
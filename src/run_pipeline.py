@@ -1,22 +1,30 @@
 import sys
 from pathlib import Path
 
+import numpy as np
+
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.ingestion.ingest import run_ingest
 from src.transform.transform import run_transform
 from src.dq.rules import run_dq
-from src.anomaly.detect import detect_anomalies
-from src.llm.explain import explain_anomaly
+from src.anomaly.detect import detect_anomalies, write_anomalies_parquet
+from src.llm.explain import explain_records, use_explanation_cache
+from src.llm.cache import ExplanationCache
 
 
-def main(explain_top_n: int = 20):
+def main(explain_top_n: int = 20, explain_workers: int = 8, use_cache: bool = True, emit_csv: bool = False,
+         force: bool = False):
     """
     Run the full data quality pipeline.
     
     Args:
         explain_top_n: Number of top anomalies to generate explanations for
+        explain_workers: Number of explanations generated concurrently
+        use_cache: Reuse LLM explanations cached on disk by earlier runs
+        emit_csv: Also write data/gold/anomalies.csv next to the Parquet output
+        force: Re-ingest and re-transform every file even if its output is up to date
     """
     print("=" * 60)
     print("ABACUS DATA QUALITY PIPELINE")
@@ -25,17 +33,17 @@ def main(explain_top_n: int = 20):
     # Step 1: Ingest
     print("\n[1/5] INGESTION")
     print("-" * 40)
-    ingest_results = run_ingest()
+    ingest_results = run_ingest(force=force)
     
     # Step 2: Transform
     print("\n[2/5] TRANSFORMATION")
     print("-" * 40)
-    transform_results = run_transform()
+    transform_results = run_transform(force=force)
     
     # Step 3: Data Quality Rules
     print("\n[3/5] DATA QUALITY RULES")
     print("-" * 40)
-    dq_anomalies = run_dq()
+    dq_anomalies = run_dq(emit_csv=emit_csv)
     
     # Step 4: Anomaly Detection
     print("\n[4/5] ANOMALY DETECTION")
@@ -47,26 +55,29 @@ def main(explain_top_n: int = 20):
     print("-" * 40)
     
     if anomalies is not None and len(anomalies) > 0:
-        # Sort by number of flags (most problematic first)
+        # Generate explanations for top N anomalies (most flags first); nlargest
+        # only partially sorts, so the full frame is never reordered
+        print(f"Generating explanations for top {explain_top_n} anomalies...")
         if "num_flags" in anomalies.columns:
-            anomalies_sorted = anomalies.sort_values("num_flags", ascending=False)
+            top_idx = anomalies["num_flags"].nlargest(explain_top_n).index
         else:
-            anomalies_sorted = anomalies
+            top_idx = anomalies.index[:explain_top_n]
+        records = anomalies.loc[top_idx].to_dict(orient="records")
+        # Anomalies sharing a flag signature reuse one cached LLM explanation
+        cache = ExplanationCache() if use_cache else None
+        use_explanation_cache(cache)
         
-        # Generate explanations for top N anomalies
-        print(f"Generating explanations for top {explain_top_n} anomalies...")
-        explanations = []
+        # LLM round-trips overlap on explain_workers threads, one per distinct flag set
+        explanations = explain_records(records, max_workers=explain_workers)
         
-        for idx, row in anomalies_sorted.head(explain_top_n).iterrows():
-            record = row.to_dict()
-            explanation = explain_anomaly(record)
-            explanations.append(explanation)
+        if cache is not None:
+            cache.save()
         
-        # Add explanation column (empty for those beyond top N)
-        anomalies["explanation"] = ""
-        top_indices = anomalies_sorted.head(explain_top_n).index
-        for i, idx in enumerate(top_indices):
-            anomalies.loc[idx, "explanation"] = explanations[i]
+        # Add explanation column (empty for those beyond top N), built as one
+        # pre-sized array and assigned once; failed explanations stay empty
+        explanation_column = np.full(len(anomalies), "", dtype=object)
+        explanation_column[anomalies.index.get_indexer(top_idx)] = [e or "" for e in explanations]
+        anomalies["explanation"] = explanation_column
         
         print(f"  Generated {len(explanations)} explanations")
         
@@ -75,14 +86,16 @@ def main(explain_top_n: int = 20):
         output_dir.mkdir(parents=True, exist_ok=True)
         
         parquet_file = output_dir / "anomalies.parquet"
-        csv_file = output_dir / "anomalies.csv"
-        
-        anomalies.to_parquet(parquet_file, index=False)
-        anomalies.to_csv(csv_file, index=False)
+        write_anomalies_parquet(anomalies, parquet_file)
         
         print(f"\nFinal outputs written to:")
         print(f"  {parquet_file}")
-        print(f"  {csv_file}")
+        
+        # The CSV mirror is opt-in; Parquet is the canonical output
+        if emit_csv:
+            csv_file = output_dir / "anomalies.csv"
+            anomalies.to_csv(csv_file, index=False, chunksize=100_000)
+            print(f"  {csv_file}")
     
     # Print Summary
     print("\n" + "=" * 60)
@@ -99,16 +112,12 @@ def main(explain_top_n: int = 20):
         if total_claims > 0:
             print(f"Anomaly rate: {total_anomalies/total_claims*100:.1f}%")
         
-        # Top anomaly reasons
+        # Top anomaly reasons (detect_anomalies always stores a list per row,
+        # so explode yields one row per reason; empty lists become NaN)
         if "anomaly_reasons" in anomalies.columns:
-            all_reasons = []
-            for reasons in anomalies["anomaly_reasons"]:
-                if isinstance(reasons, list):
-                    all_reasons.extend(reasons)
+            reason_counts = anomalies["anomaly_reasons"].explode().dropna().value_counts().head(10)
             
-            if all_reasons:
-                import pandas as pd
-                reason_counts = pd.Series(all_reasons).value_counts().head(10)
+            if len(reason_counts) > 0:
                 print("\nTop Anomaly Reasons:")
                 for reason, count in reason_counts.items():
                     print(f"  {reason}: {count}")
@@ -132,27 +141,46 @@ def main(explain_top_n: int = 20):
 
 if __name__ == "__main__":
     import argparse
-    import pandas as pd
     
     parser = argparse.ArgumentParser(description="Run the Abacus DQ Pipeline")
     parser.add_argument("--explain-top", type=int, default=20, 
                         help="Number of top anomalies to explain (default: 20)")
+    parser.add_argument("--explain-workers", type=int, default=8,
+                        help="Number of explanations generated concurrently (default: 8)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the on-disk LLM explanation cache")
+    parser.add_argument("--emit-csv", action="store_true",
+                        help="Also write data/gold/anomalies.csv")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-ingest and re-transform all files even if their outputs are up to date")
     parser.add_argument("--export-fhir", action="store_true",
                         help="Export FHIR resources after pipeline completes")
     
     args = parser.parse_args()
-    main(explain_top_n=args.explain_top)
+    main(explain_top_n=args.explain_top, explain_workers=args.explain_workers, use_cache=not args.no_cache,
+         emit_csv=args.emit_csv, force=args.force)
     
     # FHIR export (optional)
     if args.export_fhir:
         try:
-            from src.fhir.mapper import export_fhir_resources
-            # load silver tables
-            claims = pd.read_parquet("data/silver/claims.parquet")
-            providers = pd.read_parquet("data/silver/providers.parquet")
-            members = pd.read_parquet("data/silver/members.parquet")
+            from src.fhir.mapper import export_fhir_resources, PATIENT_FIELDS, PRACTITIONER_FIELDS
+            from src.transform.transform import SCHEMAS
+            from src.io.parquet_io import read_parquet_mapped
+            max_claims = 100
+            # load silver tables: only the columns the mappers read, and only the
+            # providers/members referenced by the exported claims
+            claims = read_parquet_mapped("data/silver/claims.parquet", columns=SCHEMAS["claims"])
+            exported = claims.head(max_claims)
+            providers = read_parquet_mapped(
+                "data/silver/providers.parquet", columns=PRACTITIONER_FIELDS,
+                filters=[("provider_id", "in", exported["provider_id"].dropna().unique().tolist())],
+            )
+            members = read_parquet_mapped(
+                "data/silver/members.parquet", columns=PATIENT_FIELDS,
+                filters=[("member_id", "in", exported["member_id"].dropna().unique().tolist())],
+            )
             print("\nExporting FHIR resources to data/fhir ...")
-            export_fhir_resources(claims, providers, members, out_dir="data/fhir", max_claims=100)
+            export_fhir_resources(claims, providers, members, out_dir="data/fhir", max_claims=max_claims, per_file=True)
             print("FHIR export complete: data/fhir/")
         except Exception as e:
             print("FHIR export skipped due to error:", str(e))
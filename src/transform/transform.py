@@ -1,20 +1,67 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+import multiprocessing
 import re
+import sys
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.constants import CPT_PATTERN, ICD_PATTERN
+
+
+# Columns carried from each bronze table into silver; other source columns are not read
+SCHEMAS = {
+    "claims": ["claim_id", "member_id", "provider_id", "claim_amount", "service_date", "icd_code", "cpt_code", "claim_status"],
+    "providers": ["provider_id", "provider_name", "specialty", "state", "npi"],
+    "members": ["member_id", "first_name", "last_name", "dob", "gender", "plan_type"]
+}
+
+
+# Placeholder strings treated as missing after trimming
+NULL_STRINGS = ["", "nan", "None"]
 
 
 def clean_string_columns(df: pd.DataFrame) -> pd.DataFrame:
-    """Trim whitespace from all string columns."""
-    for col in df.select_dtypes(include=["object"]).columns:
-        df[col] = df[col].astype(str).str.strip()
-        df[col] = df[col].replace(["nan", "None", ""], np.nan)
+    """Trim whitespace from all string columns; they come back as Arrow-backed strings."""
+    for col in df.select_dtypes(include=["object", "string"]).columns:
+        # One chained expression and one assignment per column: the strip runs
+        # as an Arrow UTF-8 kernel, placeholders become <NA>, and the result
+        # stays Arrow-backed instead of being copied back to object
+        df[col] = (
+            df[col].astype("string[pyarrow]")
+            .str.strip()
+            .mask(lambda s: s.isin(NULL_STRINGS))
+        )
     return df
 
 
 def normalize_date(date_series: pd.Series) -> pd.Series:
-    """Normalize dates to ISO format (YYYY-MM-DD), invalid dates become NaT."""
-    return pd.to_datetime(date_series, errors="coerce").dt.strftime("%Y-%m-%d")
+    """
+    Normalize dates to datetime64 (day precision values), invalid dates become NaT.
+    
+    Silver keeps the native datetime64 column; writers that need ISO strings
+    format it themselves.
+    """
+    return pd.to_datetime(date_series, errors="coerce").dt.normalize()
+
+
+@lru_cache(maxsize=4096)
+def _icd_ok_scalar(code: str) -> bool:
+    """
+    Check an upper-cased code against ICD_PATTERN.
+    
+    Scalar callers validate one code at a time and ICD cardinality is low, so
+    results are memoized per code. Column-wise paths use Arrow regex kernels.
+    """
+    return ICD_PATTERN.fullmatch(code) is not None
 
 
 def normalize_icd_code(code: str) -> str:
@@ -28,8 +75,7 @@ def normalize_icd_code(code: str) -> str:
     code = str(code).strip().upper()
     
     # Basic ICD-10 pattern: starts with letter, followed by digits, optional decimal
-    icd_pattern = r"^[A-Z]\d{2}\.?\d*[A-Z]?$"
-    if re.match(icd_pattern, code):
+    if _icd_ok_scalar(code):
         return code
     
     return np.nan  # Invalid format
@@ -46,115 +92,241 @@ def normalize_cpt_code(code: str) -> str:
     code = str(code).strip()
     
     # CPT codes are 5 digits
-    if re.match(r"^\d{5}$", code):
+    if CPT_PATTERN.match(code):
         return code
     
     return np.nan  # Invalid format
 
 
-def transform_claims(df: pd.DataFrame) -> pd.DataFrame:
-    """Apply transformations to claims data."""
-    df = df.copy()
+def _clean_string_array(values: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Arrow counterpart of clean_string_columns for one string column."""
+    stripped = pc.utf8_trim_whitespace(values)
+    placeholder = pc.is_in(stripped, value_set=pa.array(NULL_STRINGS))
+    return pc.if_else(placeholder, pa.scalar(None, stripped.type), stripped)
+
+
+def _normalize_code_array(values: pa.ChunkedArray, pattern: re.Pattern, upper: bool) -> pa.ChunkedArray:
+    """Upper-case (optionally) already trimmed codes; non-matching or missing codes become null."""
+    if upper:
+        values = pc.utf8_upper(values)
+    valid = pc.fill_null(pc.match_substring_regex(values, pattern.pattern), False)
+    return pc.if_else(valid, values, pa.scalar(None, values.type))
+
+
+def _arrow_string_dtype(arrow_type: pa.DataType):
+    """types_mapper for to_pandas: strings become string[pyarrow] as in clean_string_columns."""
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def transform_claims_table(table: pa.Table) -> pd.DataFrame:
+    """
+    Apply the claims transformations to an Arrow table read straight from bronze.
     
-    # Clean string columns
-    df = clean_string_columns(df)
+    String cleaning, code validation and status upper-casing run as Arrow
+    compute kernels over the column buffers, and the table is converted to
+    pandas once at the end, with string columns Arrow-backed like the other
+    silver tables. Dates and amounts are coerced in pandas, which turns
+    unparseable values into NaT/NaN where an Arrow cast would fail.
+    """
+    # Codes are validated as strings; bronze may hold all-numeric ones (e.g. CPT
+    # 99213) as integers, so they are cast before the string cleaning below
+    for name in ("icd_code", "cpt_code"):
+        i = table.schema.get_field_index(name)
+        if not pa.types.is_string(table.schema.field(i).type):
+            table = table.set_column(i, name, pc.cast(table.column(i), pa.string()))
     
-    # Normalize dates
-    df["service_date"] = normalize_date(df["service_date"])
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, _clean_string_array(table.column(i)))
     
-    # Cast claim_amount to float, coerce errors
-    df["claim_amount"] = pd.to_numeric(df["claim_amount"], errors="coerce")
+    # Normalize ICD and CPT codes
+    for name, pattern, upper in (("icd_code", ICD_PATTERN, True), ("cpt_code", CPT_PATTERN, False)):
+        i = table.schema.get_field_index(name)
+        table = table.set_column(i, name, _normalize_code_array(table.column(i), pattern, upper))
     
-    # Replace negative amounts with NaN
-    df.loc[df["claim_amount"] < 0, "claim_amount"] = np.nan
+    # Standardize claim_status to uppercase; dictionary encoding converts to a
+    # pandas categorical (low-cardinality columns are stored as categoricals)
+    i = table.schema.get_field_index("claim_status")
+    table = table.set_column(i, "claim_status", pc.utf8_upper(table.column(i)).dictionary_encode())
     
-    # Normalize ICD and CPT codes
-    df["icd_code"] = df["icd_code"].apply(normalize_icd_code)
-    df["cpt_code"] = df["cpt_code"].apply(normalize_cpt_code)
+    df = table.to_pandas(types_mapper=_arrow_string_dtype)
     
-    # Standardize claim_status to uppercase
-    df["claim_status"] = df["claim_status"].str.upper()
+    # Normalize dates
+    df["service_date"] = normalize_date(df["service_date"])
+    
+    # Cast claim_amount to float, coerce errors; negative amounts become NaN
+    amounts = pd.to_numeric(df["claim_amount"], errors="coerce").astype("float64")
+    df["claim_amount"] = amounts.mask(amounts < 0)
     
     return df
 
 
+def transform_claims(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply transformations to claims data (a thin wrapper over transform_claims_table)."""
+    result = transform_claims_table(pa.Table.from_pandas(df, preserve_index=False))
+    result.index = df.index
+    return result
+
+
 def transform_providers(df: pd.DataFrame) -> pd.DataFrame:
-    """Apply transformations to providers data."""
-    df = df.copy()
+    """Apply transformations to providers data (in place; pass a copy to keep the input)."""
     df = clean_string_columns(df)
     
     # Standardize state to uppercase
-    df["state"] = df["state"].str.upper()
+    df["state"] = df["state"].str.upper().astype("category")
     
     return df
 
 
 def transform_members(df: pd.DataFrame) -> pd.DataFrame:
-    """Apply transformations to members data."""
-    df = df.copy()
+    """Apply transformations to members data (in place; pass a copy to keep the input)."""
     df = clean_string_columns(df)
     
     # Normalize DOB
     df["dob"] = normalize_date(df["dob"])
     
     # Standardize gender
-    df["gender"] = df["gender"].str.upper()
+    df["gender"] = df["gender"].str.upper().astype("category")
     
     return df
 
 
-def run_transform(bronze_dir="data/bronze", silver_dir="data/silver"):
+TRANSFORMS = {
+    "claims": transform_claims,
+    "providers": transform_providers,
+    "members": transform_members
+}
+
+
+# Version of the silver output, stored in each silver file's Parquet metadata.
+# Bump it whenever a change to this module changes what is written to silver,
+# so silver files from an older transform are rebuilt instead of reused. Silver
+# files are only ever published complete (write_parquet_chunked renames a temp
+# file into place), so a file carrying the marker is never a partial write
+TRANSFORM_VERSION = "2"
+TRANSFORM_VERSION_KEY = b"abacus.transform_version"
+
+
+def _silver_up_to_date(bronze_file: Path, silver_file: Path) -> bool:
+    """True if silver_file was written after bronze_file by the current TRANSFORM_VERSION."""
+    if not silver_file.exists() or silver_file.stat().st_mtime < bronze_file.stat().st_mtime:
+        return False
+    metadata = pq.read_schema(silver_file).metadata or {}
+    return metadata.get(TRANSFORM_VERSION_KEY) == TRANSFORM_VERSION.encode()
+
+
+# Total bronze rows below which run_transform stays in-process: spawning workers
+# costs more than transforming small tables
+PARALLEL_MIN_ROWS = 1_000_000
+
+
+def _transform_file(file_type: str, bronze_dir: str, silver_dir: str, force: bool = False,
+                    keep_frame: bool = True):
+    """
+    Transform one bronze table and write it to silver.
+    
+    Module-level so ProcessPoolExecutor workers can unpickle it. Progress is
+    returned as report lines instead of printed, so the caller prints each
+    file's report in order.
+    
+    Returns:
+        (silver file, or None if the bronze file is missing; report lines;
+        transformed DataFrame, or None when keep_frame is False)
+    """
+    from src.io.parquet_io import read_parquet_mapped, write_parquet_chunked
+    
+    parquet_file = Path(bronze_dir) / f"{file_type}.parquet"
+    
+    if not parquet_file.exists():
+        return None, [f"Warning: {parquet_file} not found, skipping..."], None
+    
+    # Incremental: a silver file written after its bronze input by this
+    # transform version is reused as is
+    output_file = Path(silver_dir) / f"{file_type}.parquet"
+    if not force and _silver_up_to_date(parquet_file, output_file):
+        report = [f"Skipping {file_type} (silver up to date)"]
+        return output_file, report, read_parquet_mapped(output_file) if keep_frame else None
+    
+    # Read bronze data
+    report = [f"Transforming {file_type}..."]
+    # Only decode the silver columns; the footer tells which ones the file has
+    present = set(pq.read_schema(parquet_file).names)
+    columns = [col for col in SCHEMAS[file_type] if col in present]
+    if file_type == "claims":
+        # Claims are cleaned with Arrow kernels before converting to pandas
+        df_transformed = transform_claims_table(
+            pq.read_table(parquet_file, columns=columns, use_threads=True, memory_map=True)
+        )
+    else:
+        df_transformed = TRANSFORMS[file_type](read_parquet_mapped(parquet_file, columns=columns))
+    
+    # Report on null values introduced; counted column by column so no
+    # frame-sized boolean mask is allocated
+    null_counts = pd.Series({col: df_transformed[col].isna().sum() for col in df_transformed.columns})
+    cols_with_nulls = null_counts[null_counts > 0]
+    if len(cols_with_nulls) > 0:
+        null_pct = cols_with_nulls * (100.0 / len(df_transformed))
+        report.append("  Null values after transform:")
+        report.extend(f"    {col}: {count} ({pct:.1f}%)"
+                      for col, count, pct in zip(cols_with_nulls.index, cols_with_nulls, null_pct))
+    
+    # Write to silver
+    write_parquet_chunked(df_transformed, output_file, metadata={TRANSFORM_VERSION_KEY: TRANSFORM_VERSION})
+    report.append(f"  Written {len(df_transformed)} rows to {output_file}")
+    
+    return output_file, report, df_transformed if keep_frame else None
+
+
+def run_transform(bronze_dir="data/bronze", silver_dir="data/silver", max_workers: int = None, force: bool = False):
     """
     Transform bronze layer data and write to silver layer.
     
     Args:
         bronze_dir: Directory containing bronze parquet files
         silver_dir: Directory to write transformed parquet files
+        max_workers: Worker processes, one file each (default: one per file
+            when the bronze tables hold at least PARALLEL_MIN_ROWS rows in
+            total, else 1; 1 transforms the files serially in this process)
+        force: Re-transform files whose silver output is newer than the bronze
+            input and was written by the current TRANSFORM_VERSION
     
     Returns:
         Dictionary mapping file type to transformed DataFrame
     """
-    bronze_path = Path(bronze_dir)
+    from src.io.parquet_io import read_parquet_mapped
+    
     silver_path = Path(silver_dir)
     silver_path.mkdir(parents=True, exist_ok=True)
     
-    transforms = {
-        "claims": transform_claims,
-        "providers": transform_providers,
-        "members": transform_members
-    }
+    file_types = list(TRANSFORMS)
+    if max_workers is None:
+        bronze_files = [Path(bronze_dir) / f"{file_type}.parquet" for file_type in file_types]
+        total_rows = sum(pq.read_metadata(f).num_rows for f in bronze_files if f.exists())
+        max_workers = len(file_types) if total_rows >= PARALLEL_MIN_ROWS else 1
     
     results = {}
     
-    for file_type, transform_func in transforms.items():
-        parquet_file = bronze_path / f"{file_type}.parquet"
-        
-        if not parquet_file.exists():
-            print(f"Warning: {parquet_file} not found, skipping...")
-            continue
-        
-        # Read bronze data
-        print(f"Transforming {file_type}...")
-        df = pd.read_parquet(parquet_file)
-        original_count = len(df)
-        
-        # Apply transformations
-        df_transformed = transform_func(df)
-        
-        # Report on null values introduced
-        null_counts = df_transformed.isnull().sum()
-        cols_with_nulls = null_counts[null_counts > 0]
-        if len(cols_with_nulls) > 0:
-            print(f"  Null values after transform:")
-            for col, count in cols_with_nulls.items():
-                print(f"    {col}: {count} ({count/len(df_transformed)*100:.1f}%)")
-        
-        # Write to silver
-        output_file = silver_path / f"{file_type}.parquet"
-        df_transformed.to_parquet(output_file, index=False)
-        print(f"  Written {len(df_transformed)} rows to {output_file}")
-        
-        results[file_type] = df_transformed
+    if max_workers > 1:
+        # The files are independent and written to disjoint silver paths. Spawned
+        # (not forked) workers do not inherit this process's Arrow thread pools.
+        # Workers send back only their report; the silver files are read back
+        # here instead of pickling whole frames across processes
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            outputs = list(executor.map(_transform_file, file_types, repeat(str(bronze_dir)),
+                                        repeat(str(silver_dir)), repeat(force), repeat(False)))
+        for file_type, (output_file, report, _) in zip(file_types, outputs):
+            print("\n".join(report))
+            if output_file is not None:
+                results[file_type] = read_parquet_mapped(output_file)
+    else:
+        for file_type in file_types:
+            output_file, report, df = _transform_file(file_type, bronze_dir, silver_dir, force)
+            print("\n".join(report))
+            if df is not None:
+                results[file_type] = df
     
     print(f"\nTransform complete. Files written to {silver_path}")
     return results
@@ -0,0 +1,157 @@
+import pytest
+import pandas as pd
+import pyarrow as pa
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+import src.api.app as api
+
+
+# ============================================================
+# Test Data Fixtures
+# ============================================================
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """
+    API client over a gold anomalies file written the way the pipeline does:
+    service_date Arrow-backed with a missing value, num_flags an Arrow int.
+    """
+    gold_dir = tmp_path / "data" / "gold"
+    gold_dir.mkdir(parents=True)
+
+    df = pd.DataFrame({
+        "claim_id": ["CLM001", "CLM002", "CLM003", "CLM004"],
+        "provider_id": ["PRV001", "PRV002", "PRV001", "PRV003"],
+        "member_id": ["MBR001", "MBR002", "MBR003", "MBR004"],
+        "claim_amount": [100.0, 200.0, None, 400.0],
+        "service_date": pd.Series(
+            pd.to_datetime(["2024-01-15", None, "2024-03-10", "2024-05-01"])
+        ).astype(pd.ArrowDtype(pa.timestamp("ns"))),
+        "num_flags": pd.Series([1, 2, 3, 1]).astype("int8[pyarrow]"),
+        "anomaly_reasons_str": ["invalid_icd", "invalid_date", "invalid_amount,zscore_global", "invalid_cpt"],
+        "explanation": ["Existing explanation", "", "", ""],
+    })
+    df.to_parquet(gold_dir / "anomalies.parquet", index=False)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, "_anomalies_cache", None)
+    monkeypatch.setattr(api, "_claim_index", None)
+    monkeypatch.setattr(api, "_column_kinds", None)
+    monkeypatch.setattr(api, "_generated_explanations", {})
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    return TestClient(api.app)
+
+
+# ============================================================
+# Test Anomaly Filters
+# ============================================================
+
+def test_anomalies_start_date_filter(client):
+    """Rows before start_date and rows without a date are filtered out."""
+    response = client.get("/anomalies", params={"start_date": "2024-02-01"})
+
+    assert response.status_code == 200
+    claim_ids = [r["claim_id"] for r in response.json()["anomalies"]]
+    assert claim_ids == ["CLM003", "CLM004"]
+
+
+def test_anomalies_date_range_filter(client):
+    """start_date and end_date combine into one inclusive range."""
+    response = client.get("/anomalies", params={"start_date": "2024-01-01", "end_date": "2024-03-10"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["claim_id"] for r in body["anomalies"]] == ["CLM001", "CLM003"]
+    assert body["anomalies"][0]["service_date"] == "2024-01-15"
+
+
+def test_anomalies_provider_and_severity_filter(client):
+    """Provider and severity filters combine with the date filters."""
+    response = client.get("/anomalies", params={"provider_id": "PRV001", "severity": 2, "end_date": "2024-12-31"})
+
+    assert response.status_code == 200
+    assert [r["claim_id"] for r in response.json()["anomalies"]] == ["CLM003"]
+
+
+# ============================================================
+# Test Claim Explanations
+# ============================================================
+
+def test_claim_explanation_existing(client):
+    """A stored explanation is returned as is."""
+    response = client.get("/claim/CLM001/explanation")
+
+    assert response.status_code == 200
+    assert response.json()["explanation"] == "Existing explanation"
+
+
+def test_claim_explanation_generated_once(client, monkeypatch):
+    """A missing explanation is generated once and kept out of the cached frame."""
+    import src.llm.explain as explain
+
+    calls = []
+    def fake_explain(record):
+        calls.append(record["claim_id"])
+        return f"Generated for {record['claim_id']}"
+    monkeypatch.setattr(explain, "explain_anomaly", fake_explain)
+
+    first = client.get("/claim/CLM002/explanation")
+    second = client.get("/claim/CLM002/explanation")
+
+    assert first.status_code == second.status_code == 200
+    assert first.json()["explanation"] == second.json()["explanation"] == "Generated for CLM002"
+    assert calls == ["CLM002"]
+    # The shared cached DataFrame is not mutated
+    cached = api.load_anomalies()
+    assert cached.loc[cached["claim_id"] == "CLM002", "explanation"].tolist() == [""]
+
+
+def test_claim_explanation_not_found(client):
+    """Unknown claims return 404."""
+    assert client.get("/claim/UNKNOWN/explanation").status_code == 404
+
+
+def test_claim_explanation_without_claim_id_column(client, tmp_path):
+    """A gold file without claim_id has no index; lookups return 404."""
+    pd.DataFrame({"provider_id": ["PRV001"], "num_flags": [1]}).to_parquet(
+        tmp_path / "data" / "gold" / "anomalies.parquet", index=False
+    )
+
+    assert client.get("/claim/CLM001/explanation").status_code == 404
+
+
+# ============================================================
+# Test Cache Refresh
+# ============================================================
+
+def test_refresh_swaps_in_new_data(client, tmp_path):
+    """After /refresh the frame, claim index and row values all come from the new file."""
+    assert client.get("/claim/CLM001/explanation").status_code == 200
+
+    pd.DataFrame({
+        "claim_id": ["CLM009", "CLM001"],
+        "claim_amount": [900.0, 150.0],
+        "explanation": ["New explanation", "Updated explanation"],
+    }).to_parquet(tmp_path / "data" / "gold" / "anomalies.parquet", index=False)
+
+    assert client.post("/refresh").status_code == 200
+    response = client.get("/claim/CLM001/explanation")
+    assert response.json()["explanation"] == "Updated explanation"
+    assert response.json()["anomaly_record"]["claim_amount"] == 150.0
+    assert client.get("/claim/CLM009/explanation").status_code == 200
+    assert client.get("/claim/CLM002/explanation").status_code == 404
+
+
+def test_refresh_missing_file(client, tmp_path):
+    """/refresh without a gold file returns 404 and drops the old cache."""
+    assert client.get("/claim/CLM001/explanation").status_code == 200
+    (tmp_path / "data" / "gold" / "anomalies.parquet").unlink()
+
+    assert client.post("/refresh").status_code == 404
+    assert client.get("/claim/CLM001/explanation").status_code == 404
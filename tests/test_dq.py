@@ -290,6 +290,28 @@ def test_detect_anomalies_adds_columns(sample_claims):
     assert "anomaly_reasons_str" in result.columns
 
 
+def test_detect_anomalies_leaves_input_and_key_dtypes(claims_with_outliers):
+    """The input is not modified and provider_id/cpt_code keep their dtypes in the result."""
+    original = claims_with_outliers.copy()
+    result = detect_anomalies(claims_with_outliers)
+    
+    pd.testing.assert_frame_equal(claims_with_outliers, original)
+    assert result["provider_id"].dtype == original["provider_id"].dtype
+    assert result["cpt_code"].dtype == original["cpt_code"].dtype
+    assert result["provider_id"].tolist() == original["provider_id"].tolist()
+
+
+def test_detect_anomalies_writes_parquet(claims_with_outliers, tmp_path):
+    """Test that detect_anomalies writes its result when output_path is given."""
+    output_file = tmp_path / "anomalies.parquet"
+    result = detect_anomalies(claims_with_outliers, output_path=output_file)
+    
+    written = pd.read_parquet(output_file)
+    assert len(written) == len(result)
+    assert written["is_anomalous"].tolist() == result["is_anomalous"].tolist()
+    assert list(written["anomaly_reasons"].iloc[20]) == result["anomaly_reasons"].iloc[20]
+
+
 # ============================================================
 # Test Full DQ Pipeline
 # ============================================================
@@ -320,7 +342,31 @@ def test_run_dq_creates_output(tmp_path):
     assert result is not None
     assert len(result) > 0
     assert (output_dir / "anomalies.parquet").exists()
-    assert (output_dir / "anomalies.csv").exists()
+    assert not (output_dir / "anomalies.csv").exists()
+
+
+def test_run_dq_emit_csv(tmp_path):
+    """Test that run_dq writes the CSV mirror only when asked to."""
+    silver_dir = tmp_path / "silver"
+    silver_dir.mkdir()
+    
+    test_claims = pd.DataFrame({
+        "claim_id": ["CLM001", "CLM001"],
+        "member_id": ["MBR001", "MBR002"],
+        "provider_id": ["PRV001", "PRV002"],
+        "claim_amount": [100.0, 200.0],
+        "service_date": ["2024-01-15", "2024-02-20"],
+        "icd_code": ["A00.0", "B20"],
+        "cpt_code": ["99213", "99214"],
+        "claim_status": ["PAID", "DENIED"]
+    })
+    test_claims.to_parquet(silver_dir / "claims.parquet")
+    
+    output_dir = tmp_path / "gold"
+    result = run_dq(str(silver_dir), str(output_dir), emit_csv=True)
+    
+    written = pd.read_csv(output_dir / "anomalies.csv")
+    assert written["claim_id"].tolist() == result["claim_id"].tolist()
 
 
 # ============================================================
@@ -13,3 +13,57 @@ def test_map_patient_and_claim():
     assert c["patient"]["reference"] == "Patient/m1"
     assert "total" in c
     assert c["total"]["value"] == 250.0
+
+
+def _duplicate_claims():
+    import pandas as pd
+    claims = pd.DataFrame({"claim_id":["c1","c2","c1"],"member_id":["m1","m1","m1"],"provider_id":["pr1","pr1","pr1"],"claim_amount":[100.0,200.0,300.0],"service_date":["2025-01-10","2025-01-11","2025-01-12"],"icd_code":["I10","I10","I10"],"cpt_code":["99213","99213","99213"],"claim_status":["PAID","PAID","DENIED"]})
+    providers = pd.DataFrame({"provider_id":["pr1"],"provider_name":["Dr Smith"],"specialty":["Cardiology"],"state":["CA"],"npi":["1234567890"]})
+    members = pd.DataFrame({"member_id":["m1"],"first_name":["John"],"last_name":["Doe"],"dob":["1980-01-01"],"gender":["M"]})
+    return claims, providers, members
+
+
+def test_export_per_file_dedupes_claim_ids(tmp_path):
+    import json
+    from src.fhir.mapper import export_fhir_resources
+    claims, providers, members = _duplicate_claims()
+    counts = export_fhir_resources(claims, providers, members, out_dir=str(tmp_path), per_file=True)
+    assert counts == {"Patient": 1, "Practitioner": 1, "Claim": 2, "Encounter": 2}
+    assert sorted(p.name for p in (tmp_path / "Claim").iterdir()) == ["c1.json", "c2.json"]
+    # Last row wins for a repeated claim ID
+    c1 = json.loads((tmp_path / "Claim" / "c1.json").read_text())
+    assert c1["total"]["value"] == 300.0
+    assert c1["status"] == "cancelled"
+
+
+def test_export_ndjson_default_layout(tmp_path):
+    import json
+    from src.fhir.mapper import export_fhir_resources
+    claims, providers, members = _duplicate_claims()
+    counts = export_fhir_resources(claims, providers, members, out_dir=str(tmp_path / "ndjson"))
+    assert counts == {"Patient": 1, "Practitioner": 1, "Claim": 2, "Encounter": 2}
+    assert not (tmp_path / "ndjson" / "Claim").exists()
+    for resource_type, count in counts.items():
+        lines = (tmp_path / "ndjson" / f"{resource_type}.ndjson").read_text().splitlines()
+        assert len(lines) == count
+    # Same resources as the per-file layout
+    export_fhir_resources(claims, providers, members, out_dir=str(tmp_path / "files"), per_file=True)
+    for line in (tmp_path / "ndjson" / "Claim.ndjson").read_text().splitlines():
+        claim = json.loads(line)
+        assert json.loads((tmp_path / "files" / "Claim" / f"{claim['id']}.json").read_text()) == claim
+
+
+def test_mapped_resources_do_not_share_state():
+    import pandas as pd
+    from src.fhir.mapper import map_claim_to_fhir, map_encounter_to_fhir
+    claim = pd.Series({"claim_id":"c1","member_id":"m1","provider_id":"pr1","claim_amount":None,"service_date":"2025-01-10","icd_code":"I10","cpt_code":"99213","claim_status":"PAID"})
+    first = map_claim_to_fhir(claim)
+    first["type"]["coding"][0]["code"] = "changed"
+    first["item"][0]["unitPrice"]["value"] = 42
+    second = map_claim_to_fhir(claim)
+    assert second["type"]["coding"][0]["code"] == "professional"
+    assert second["item"][0]["unitPrice"] == {"value": 0, "currency": "USD"}
+    assert "total" not in second
+    encounter = map_encounter_to_fhir(claim)
+    encounter["class"]["code"] = "changed"
+    assert map_encounter_to_fhir(claim)["class"]["code"] == "AMB"
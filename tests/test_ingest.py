@@ -0,0 +1,186 @@
+import pytest
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import src.ingestion.ingest as ingest
+from src.ingestion.ingest import run_ingest
+
+
+# ============================================================
+# Test Data Fixtures
+# ============================================================
+
+@pytest.fixture
+def source_dir(tmp_path):
+    """A source directory with a small claims CSV."""
+    pd.DataFrame({
+        "claim_id": ["CLM001", "CLM002"],
+        "member_id": ["MBR001", "MBR002"],
+        "provider_id": ["PRV001", "PRV002"],
+        "claim_amount": [100.0, 200.0],
+        "service_date": ["2024-01-15", "2024-02-20"],
+        "icd_code": ["A00.0", "B20"],
+        "cpt_code": ["99213", "99214"],
+        "claim_status": ["PAID", "DENIED"]
+    }).to_csv(tmp_path / "claims.csv", index=False)
+    return tmp_path
+
+
+# ============================================================
+# Test Column Types
+# ============================================================
+
+def test_ingest_keeps_numeric_looking_codes_as_strings(tmp_path):
+    """IDs and codes made only of digits are written to bronze as strings."""
+    pd.DataFrame({
+        "claim_id": [1, 2],
+        "member_id": [101, 102],
+        "provider_id": [7, 8],
+        "claim_amount": [100.0, 200.0],
+        "service_date": ["2024-01-15", "2024-02-20"],
+        "icd_code": ["A00.0", "B20"],
+        "cpt_code": ["99213", "09214"],
+        "claim_status": ["PAID", "DENIED"]
+    }).to_csv(tmp_path / "claims.csv", index=False)
+
+    run_ingest(tmp_path, tmp_path / "bronze")
+
+    schema = pq.read_schema(tmp_path / "bronze" / "claims.parquet")
+    for col in ["claim_id", "member_id", "provider_id", "icd_code", "cpt_code"]:
+        assert schema.field(col).type == pa.string()
+    bronze = pd.read_parquet(tmp_path / "bronze" / "claims.parquet")
+    assert bronze["cpt_code"].tolist() == ["99213", "09214"]
+
+
+def _large_claims(n_rows: int) -> pd.DataFrame:
+    """Claims whose codes all look numeric until the last row."""
+    return pd.DataFrame({
+        "claim_id": [f"CLM{i:06d}" for i in range(n_rows)],
+        "member_id": ["MBR001"] * n_rows,
+        "provider_id": ["PRV001"] * n_rows,
+        "claim_amount": [100.0] * n_rows,
+        "service_date": ["2024-01-15"] * n_rows,
+        "icd_code": ["A00.0"] * n_rows,
+        "cpt_code": ["99213"] * (n_rows - 1) + ["XXXXX"],
+        "claim_status": ["PAID"] * n_rows
+    })
+
+
+def test_ingest_codes_across_block_boundary(tmp_path, monkeypatch):
+    """A non-numeric code after the first CSV block is read like the rest."""
+    monkeypatch.setattr(ingest, "CSV_BLOCK_SIZE", 4096)
+    _large_claims(2000).to_csv(tmp_path / "claims.csv", index=False)
+
+    run_ingest(tmp_path, tmp_path / "bronze")
+
+    bronze = pd.read_parquet(tmp_path / "bronze" / "claims.parquet")
+    assert len(bronze) == 2000
+    assert bronze["cpt_code"].iloc[-1] == "XXXXX"
+
+
+def test_ingest_failure_leaves_no_bronze_file(tmp_path, monkeypatch):
+    """A conversion error after the first block publishes no partial bronze file."""
+    monkeypatch.setattr(ingest, "CSV_BLOCK_SIZE", 4096)
+    claims = _large_claims(2000).astype({"claim_amount": object})
+    claims.loc[1999, "claim_amount"] = "not a number"
+    claims.to_csv(tmp_path / "claims.csv", index=False)
+
+    with pytest.raises(pa.ArrowInvalid):
+        run_ingest(tmp_path, tmp_path / "bronze")
+
+    assert list((tmp_path / "bronze").iterdir()) == []
+
+
+# ============================================================
+# Test Source Selection
+# ============================================================
+
+def test_ingest_prefers_newer_parquet_over_stale_csv(source_dir):
+    """A leftover CSV older than the Parquet source does not shadow it."""
+    pd.read_csv(source_dir / "claims.csv").head(1).to_parquet(source_dir / "claims.parquet", index=False)
+    csv_mtime = (source_dir / "claims.csv").stat().st_mtime
+    os.utime(source_dir / "claims.parquet", (csv_mtime + 10, csv_mtime + 10))
+
+    run_ingest(source_dir, source_dir / "bronze")
+
+    assert len(pd.read_parquet(source_dir / "bronze" / "claims.parquet")) == 1
+
+
+def test_ingest_uses_newer_csv(source_dir):
+    """A CSV written after the Parquet source is ingested."""
+    pd.read_csv(source_dir / "claims.csv").head(1).to_parquet(source_dir / "claims.parquet", index=False)
+    parquet_mtime = (source_dir / "claims.parquet").stat().st_mtime
+    os.utime(source_dir / "claims.csv", (parquet_mtime + 10, parquet_mtime + 10))
+
+    run_ingest(source_dir, source_dir / "bronze")
+
+    assert len(pd.read_parquet(source_dir / "bronze" / "claims.parquet")) == 2
+
+
+# ============================================================
+# Test Incremental Ingest
+# ============================================================
+
+def test_ingest_skips_up_to_date_bronze(source_dir, capsys):
+    """A bronze file written after its source is reused."""
+    bronze_dir = source_dir / "bronze"
+    run_ingest(source_dir, bronze_dir)
+    capsys.readouterr()
+
+    paths = run_ingest(source_dir, bronze_dir)
+
+    assert "bronze up to date" in capsys.readouterr().out
+    assert paths["claims"] == str(bronze_dir / "claims.parquet")
+
+
+def test_ingest_reruns_on_newer_source(source_dir, capsys):
+    """A source modified after the bronze file is ingested again."""
+    bronze_dir = source_dir / "bronze"
+    run_ingest(source_dir, bronze_dir)
+    bronze_mtime = (bronze_dir / "claims.parquet").stat().st_mtime
+    os.utime(source_dir / "claims.csv", (bronze_mtime + 10, bronze_mtime + 10))
+    capsys.readouterr()
+
+    run_ingest(source_dir, bronze_dir)
+
+    out = capsys.readouterr().out
+    assert "Reading" in out
+    assert "bronze up to date" not in out
+
+
+def test_ingest_force_rereads_source(source_dir, capsys):
+    """force=True ingests sources whose bronze output is up to date."""
+    bronze_dir = source_dir / "bronze"
+    run_ingest(source_dir, bronze_dir)
+    capsys.readouterr()
+
+    run_ingest(source_dir, bronze_dir, force=True)
+
+    out = capsys.readouterr().out
+    assert "Reading" in out
+    assert "bronze up to date" not in out
+    assert len(pd.read_parquet(bronze_dir / "claims.parquet")) == 2
+
+
+def test_ingest_rebuilds_after_interrupted_write(source_dir, monkeypatch, capsys):
+    """An ingest interrupted mid-write is not taken as up to date by the next run."""
+    bronze_dir = source_dir / "bronze"
+    def interrupted_write(self, batch, *args, **kwargs):
+        raise KeyboardInterrupt
+    with monkeypatch.context() as patch:
+        patch.setattr(pq.ParquetWriter, "write_batch", interrupted_write)
+        with pytest.raises(KeyboardInterrupt):
+            run_ingest(source_dir, bronze_dir)
+    capsys.readouterr()
+
+    run_ingest(source_dir, bronze_dir)
+
+    assert "bronze up to date" not in capsys.readouterr().out
+    assert len(pd.read_parquet(bronze_dir / "claims.parquet")) == 2
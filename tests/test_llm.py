@@ -0,0 +1,197 @@
+import json
+import pytest
+import pandas as pd
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import src.llm.explain as explain
+import src.run_pipeline as run_pipeline
+from src.llm.cache import ExplanationCache
+from src.llm.explain import explain_records, flags_fingerprint, use_explanation_cache
+
+
+# ============================================================
+# Test Data Fixtures
+# ============================================================
+
+@pytest.fixture
+def openai_calls(monkeypatch):
+    """Fake OpenAI with an API key set; records the prompts it was called with."""
+    calls = []
+    def fake_call_openai(prompt):
+        calls.append(prompt)
+        return f"LLM explanation {len(calls)}"
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(explain, "call_openai", fake_call_openai)
+    use_explanation_cache(None)
+    yield calls
+    use_explanation_cache(None)
+
+
+# ============================================================
+# Test Explanation Cache
+# ============================================================
+
+def test_cache_round_trip(tmp_path):
+    """Saved entries are loaded back by a new cache on the same file."""
+    path = tmp_path / "cache" / "llm_explanations.json"
+    cache = ExplanationCache(path)
+    cache["invalid_cpt,invalid_icd"] = "Both codes are invalid."
+    cache.save()
+
+    assert ExplanationCache(path) == {"invalid_cpt,invalid_icd": "Both codes are invalid."}
+    assert not path.with_suffix(".tmp").exists()
+
+
+@pytest.mark.parametrize("content", ["{not json", "[1, 2, 3]"])
+def test_cache_unreadable_file_starts_empty(tmp_path, content):
+    """A corrupt or non-object cache file is ignored and overwritten on save."""
+    path = tmp_path / "llm_explanations.json"
+    path.write_text(content, encoding="utf-8")
+
+    cache = ExplanationCache(path)
+    assert cache == {}
+
+    cache["invalid_icd"] = "Invalid ICD code."
+    cache.save()
+    assert json.loads(path.read_text(encoding="utf-8")) == {"invalid_icd": "Invalid ICD code."}
+
+
+def test_flags_fingerprint_normalization():
+    """The fingerprint ignores flag order and duplicates."""
+    assert flags_fingerprint(["invalid_icd", "invalid_cpt"]) == "invalid_cpt,invalid_icd"
+    assert flags_fingerprint(("invalid_cpt", "invalid_icd", "invalid_cpt")) == "invalid_cpt,invalid_icd"
+    assert flags_fingerprint([]) == ""
+
+
+# ============================================================
+# Test LLM Explanations
+# ============================================================
+
+def test_explain_records_one_call_per_flag_set(openai_calls):
+    """Records sharing a flag set (in any order or case) trigger a single OpenAI call."""
+    records = [
+        {"claim_id": "CLM001", "claim_amount": 100.0, "anomaly_reasons_str": "invalid_icd,invalid_cpt"},
+        {"claim_id": "CLM002", "claim_amount": 200.0, "anomaly_reasons_str": "invalid_cpt, INVALID_ICD"},
+        {"claim_id": "CLM003", "claim_amount": 300.0, "flags": ["invalid_icd", "invalid_cpt"]},
+        {"claim_id": "CLM004", "claim_amount": 400.0, "anomaly_reasons_str": "invalid_date"},
+    ] * 5
+
+    explanations = explain_records(records, max_workers=8)
+
+    assert len(openai_calls) == 2
+    assert len(explanations) == len(records)
+    assert explanations[0].startswith("Claim CLM001 ($100.0): ")
+    assert explanations[0].split(": ", 1)[1] == explanations[1].split(": ", 1)[1]
+    assert explanations[3].split(": ", 1)[1] != explanations[0].split(": ", 1)[1]
+
+
+def test_explain_records_failed_call_falls_back(openai_calls, monkeypatch):
+    """A failed call is made once per flag set and every record gets the fallback."""
+    def failing_call_openai(prompt):
+        openai_calls.append(prompt)
+        return None
+    monkeypatch.setattr(explain, "call_openai", failing_call_openai)
+    records = [{"claim_id": f"CLM00{i}", "claim_amount": 100.0, "anomaly_reasons_str": "invalid_icd"}
+               for i in range(4)]
+
+    explanations = explain_records(records)
+
+    assert len(openai_calls) == 1
+    assert explanations == [explain.generate_fallback_explanation(r) for r in records]
+
+
+@pytest.mark.parametrize("amount", [None, float("nan"), pd.NA])
+def test_missing_amount_shown_as_na(openai_calls, amount):
+    """Missing amounts read N/A in the LLM header and the fallback."""
+    record = {"claim_id": "CLM001", "claim_amount": amount, "anomaly_reasons_str": "invalid_amount"}
+
+    assert explain.explain_anomaly(record) == "Claim CLM001 (N/A): LLM explanation 1"
+    assert explain.generate_fallback_explanation(record).startswith("Claim CLM001 (N/A) was flagged")
+
+
+def test_present_amount_shown_with_dollar_sign():
+    """Present amounts keep the $ prefix."""
+    record = {"claim_id": "CLM001", "claim_amount": 250.5, "anomaly_reasons_str": "invalid_icd"}
+
+    assert explain.generate_fallback_explanation(record).startswith("Claim CLM001 ($250.5) was flagged")
+
+
+def test_openai_client_has_no_sdk_retries(monkeypatch):
+    """The SDK client does not retry on its own; call_openai's loop is the only retry."""
+    monkeypatch.setattr(explain, "OpenAI", lambda **kwargs: kwargs)
+    explain._openai_client.cache_clear()
+    try:
+        assert explain._openai_client("test-key")["max_retries"] == 0
+    finally:
+        explain._openai_client.cache_clear()
+
+
+def test_call_openai_rate_limit_attempts(monkeypatch):
+    """A persistent rate limit costs OPENAI_MAX_RETRIES + 1 requests in total."""
+    class FakeRateLimitError(Exception):
+        pass
+
+    attempts = []
+    def create(**kwargs):
+        attempts.append(kwargs)
+        raise FakeRateLimitError("rate limited")
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    monkeypatch.setattr(explain, "RateLimitError", FakeRateLimitError, raising=False)
+    monkeypatch.setattr(explain, "_get_client", lambda: fake_client)
+    monkeypatch.setattr(explain.time, "sleep", lambda seconds: None)
+
+    assert explain.call_openai("prompt") is None
+    assert len(attempts) == explain.OPENAI_MAX_RETRIES + 1
+
+
+# ============================================================
+# Test Pipeline Cache Usage
+# ============================================================
+
+@pytest.fixture
+def stub_pipeline(tmp_path, monkeypatch):
+    """run_pipeline.main over one anomaly, with the data stages stubbed out."""
+    anomalies = pd.DataFrame({
+        "claim_id": ["CLM001"],
+        "claim_amount": [100.0],
+        "num_flags": [1],
+        "anomaly_reasons": [["invalid_icd"]],
+        "anomaly_reasons_str": ["invalid_icd"],
+    })
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(run_pipeline, "run_ingest", lambda force=False: {})
+    monkeypatch.setattr(run_pipeline, "run_transform", lambda force=False: {})
+    monkeypatch.setattr(run_pipeline, "run_dq", lambda emit_csv=False: anomalies)
+    monkeypatch.setattr(run_pipeline, "detect_anomalies", lambda dq: dq.copy())
+    monkeypatch.setattr(run_pipeline, "write_anomalies_parquet", lambda df, path: None)
+
+    cache_file = tmp_path / "data" / "cache" / "llm_explanations.json"
+    cache_file.parent.mkdir(parents=True)
+    cache_file.write_text(json.dumps({"invalid_icd": "Cached explanation."}), encoding="utf-8")
+    return cache_file
+
+
+def test_pipeline_reuses_disk_cache(stub_pipeline, openai_calls):
+    """By default the on-disk cache answers known flag sets without calling OpenAI."""
+    result = run_pipeline.main(explain_top_n=1)
+
+    assert openai_calls == []
+    assert result["explanation"].iloc[0].endswith(": Cached explanation.")
+
+
+def test_pipeline_no_cache_bypasses_disk(stub_pipeline, openai_calls):
+    """use_cache=False (--no-cache) neither reads nor writes the cache file."""
+    before = stub_pipeline.read_text(encoding="utf-8")
+
+    result = run_pipeline.main(explain_top_n=1, use_cache=False)
+
+    assert len(openai_calls) == 1
+    assert result["explanation"].iloc[0].endswith(": LLM explanation 1")
+    assert stub_pipeline.read_text(encoding="utf-8") == before
@@ -0,0 +1,235 @@
+import pytest
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import src.transform.transform as transform
+from src.transform.transform import (
+    TRANSFORM_VERSION,
+    TRANSFORM_VERSION_KEY,
+    normalize_icd_code,
+    run_transform,
+    transform_claims,
+    transform_claims_table,
+    transform_providers,
+)
+
+
+# ============================================================
+# Test Data Fixtures
+# ============================================================
+
+@pytest.fixture
+def raw_claims():
+    """Bronze-like claims with whitespace, placeholders and invalid values."""
+    return pd.DataFrame({
+        "claim_id": [" CLM001 ", "CLM002", "CLM003", "CLM004", "CLM005"],
+        "member_id": ["MBR001", "nan", "MBR003", None, "  "],
+        "provider_id": ["PRV001", "PRV002", "None", "PRV004", "PRV005"],
+        "claim_amount": [100.0, -50.0, None, 400.0, 0.0],
+        "service_date": ["2024-01-15", "invalid", None, " 2024-04-05 ", "2024-05-01"],
+        "icd_code": [" a00.0", "B20", "INVALID", None, "e11.9x"],
+        "cpt_code": ["99213", "9921", " 99215 ", "abcde", None],
+        "claim_status": ["paid", "DENIED", " pending ", None, "Paid"]
+    })
+
+
+# ============================================================
+# Test Claims Transform
+# ============================================================
+
+def test_transform_claims_matches_table_version(raw_claims):
+    """The DataFrame entry point gives the same output as the Arrow table one."""
+    from_frame = transform_claims(raw_claims.copy())
+    from_table = transform_claims_table(pa.Table.from_pandas(raw_claims, preserve_index=False))
+
+    pd.testing.assert_frame_equal(from_frame, from_table)
+
+
+def test_transform_claims_values(raw_claims):
+    """Strings are trimmed, placeholders and invalid values become missing."""
+    result = transform_claims(raw_claims.copy())
+
+    assert result["claim_id"].iloc[0] == "CLM001"
+    assert result["member_id"].isna().tolist() == [False, True, False, True, True]
+    assert result["icd_code"].tolist()[:3] == ["A00.0", "B20", pd.NA]
+    assert result["icd_code"].iloc[4] == "E11.9X"
+    assert result["cpt_code"].isna().tolist() == [False, True, False, True, True]
+    assert np.isnan(result["claim_amount"].iloc[1])
+    assert result["service_date"].isna().tolist() == [False, True, True, False, False]
+    assert result["claim_status"].tolist()[:3] == ["PAID", "DENIED", "PENDING"]
+
+
+def test_transform_claims_numeric_codes(raw_claims):
+    """Codes stored as integers in bronze are validated as strings."""
+    table = pa.Table.from_pandas(raw_claims, preserve_index=False)
+    table = table.set_column(
+        table.schema.get_field_index("cpt_code"), "cpt_code",
+        pa.array([99213, 99214, None, 9921, 99215], pa.int64())
+    )
+
+    result = transform_claims_table(table)
+
+    assert result["cpt_code"].tolist()[:2] == ["99213", "99214"]
+    assert result["cpt_code"].isna().tolist() == [False, False, True, True, False]
+    assert result["cpt_code"].dtype == pd.StringDtype("pyarrow")
+
+
+def test_run_transform_numeric_cpt_bronze(tmp_path, raw_claims):
+    """run_transform handles a bronze file whose CPT codes were stored as int64."""
+    bronze_dir = tmp_path / "bronze"
+    bronze_dir.mkdir()
+    raw_claims.assign(cpt_code=[99213, 99214, 99215, 99203, 99204]).to_parquet(
+        bronze_dir / "claims.parquet", index=False
+    )
+
+    results = run_transform(bronze_dir, tmp_path / "silver", max_workers=1)
+
+    assert results["claims"]["cpt_code"].tolist() == ["99213", "99214", "99215", "99203", "99204"]
+
+
+def test_silver_string_dtypes_consistent(raw_claims):
+    """Claims and providers both come out with Arrow-backed string columns."""
+    claims = transform_claims(raw_claims.copy())
+    providers = transform_providers(pd.DataFrame({
+        "provider_id": ["PRV001"], "provider_name": [" Dr Smith "], "state": ["ca"]
+    }))
+
+    assert claims["claim_id"].dtype == providers["provider_id"].dtype == pd.StringDtype("pyarrow")
+    assert isinstance(claims["claim_status"].dtype, pd.CategoricalDtype)
+    assert claims["service_date"].dtype == np.dtype("datetime64[ns]")
+    assert claims["claim_amount"].dtype == np.dtype("float64")
+
+
+# ============================================================
+# Test Scalar ICD Validation
+# ============================================================
+
+@pytest.mark.parametrize("code", [
+    "A00", "B20", "A00.0", "C34.90", "E11.9", "Z99.89X", "S72001A", "E119", "A00.", "A00X",
+    # Trimmed and upper-cased before validation
+    "a00", " A00", "c34.90 ",
+])
+def test_normalize_icd_code_valid(code):
+    """Valid ICD-10 codes are kept, trimmed and upper-cased."""
+    assert normalize_icd_code(code) == code.strip().upper()
+
+
+@pytest.mark.parametrize("code", [
+    "A", "A0", "AA0", "000", "A0B", "A00..1", "A00.0XX", "A00.X1", "A00-1", "AB00", "A00.0.0",
+])
+def test_normalize_icd_code_invalid(code):
+    """Codes not matching ICD_PATTERN become NaN."""
+    assert pd.isna(normalize_icd_code(code))
+
+
+def test_normalize_icd_code():
+    """normalize_icd_code trims and upper-cases valid codes, invalid ones become NaN."""
+    assert normalize_icd_code(" c34.90 ") == "C34.90"
+    assert pd.isna(normalize_icd_code("INVALID"))
+    assert pd.isna(normalize_icd_code(None))
+
+
+# ============================================================
+# Test Incremental Transform
+# ============================================================
+
+@pytest.fixture
+def bronze_claims(tmp_path, raw_claims):
+    """A bronze claims file; returns (bronze dir, silver dir)."""
+    bronze_dir = tmp_path / "bronze"
+    bronze_dir.mkdir()
+    raw_claims.to_parquet(bronze_dir / "claims.parquet", index=False)
+    return bronze_dir, tmp_path / "silver"
+
+
+def _run(bronze_dir, silver_dir, capsys, force=False):
+    """Run the transform serially and return its printed output."""
+    run_transform(bronze_dir, silver_dir, max_workers=1, force=force)
+    return capsys.readouterr().out
+
+
+def test_transform_writes_version_marker(bronze_claims, capsys):
+    """Silver files carry the transform version in their Parquet metadata."""
+    bronze_dir, silver_dir = bronze_claims
+    _run(bronze_dir, silver_dir, capsys)
+
+    metadata = pq.read_schema(silver_dir / "claims.parquet").metadata
+    assert metadata[TRANSFORM_VERSION_KEY] == TRANSFORM_VERSION.encode()
+    assert b"pandas" in metadata
+
+
+def test_transform_skips_up_to_date_silver(bronze_claims, capsys):
+    """A second run reuses silver written after its bronze input."""
+    bronze_dir, silver_dir = bronze_claims
+    _run(bronze_dir, silver_dir, capsys)
+
+    out = _run(bronze_dir, silver_dir, capsys)
+
+    assert "Skipping claims (silver up to date)" in out
+    assert "Transforming claims" not in out
+
+
+def test_transform_reruns_on_newer_bronze(bronze_claims, capsys):
+    """Bronze written after silver invalidates it."""
+    bronze_dir, silver_dir = bronze_claims
+    _run(bronze_dir, silver_dir, capsys)
+    silver_mtime = (silver_dir / "claims.parquet").stat().st_mtime
+    os.utime(bronze_dir / "claims.parquet", (silver_mtime + 10, silver_mtime + 10))
+
+    assert "Transforming claims" in _run(bronze_dir, silver_dir, capsys)
+
+
+def test_transform_force_reruns(bronze_claims, capsys):
+    """force=True re-transforms up-to-date silver files."""
+    bronze_dir, silver_dir = bronze_claims
+    _run(bronze_dir, silver_dir, capsys)
+
+    out = _run(bronze_dir, silver_dir, capsys, force=True)
+    assert "Transforming claims" in out
+    assert "Skipping" not in out
+
+
+def test_transform_version_change_invalidates_silver(bronze_claims, capsys, monkeypatch):
+    """Silver written by another transform version is rebuilt even if newer than bronze."""
+    bronze_dir, silver_dir = bronze_claims
+    _run(bronze_dir, silver_dir, capsys)
+
+    monkeypatch.setattr(transform, "TRANSFORM_VERSION", "next")
+    assert "Transforming claims" in _run(bronze_dir, silver_dir, capsys)
+    metadata = pq.read_schema(silver_dir / "claims.parquet").metadata
+    assert metadata[TRANSFORM_VERSION_KEY] == b"next"
+
+
+def test_transform_unmarked_silver_is_rebuilt(bronze_claims, raw_claims, capsys):
+    """Silver files from before the version marker are rebuilt."""
+    bronze_dir, silver_dir = bronze_claims
+    silver_dir.mkdir()
+    silver_file = silver_dir / "claims.parquet"
+    raw_claims.to_parquet(silver_file, index=False)
+    bronze_mtime = (bronze_dir / "claims.parquet").stat().st_mtime
+    os.utime(silver_file, (bronze_mtime + 10, bronze_mtime + 10))
+
+    assert "Transforming claims" in _run(bronze_dir, silver_dir, capsys)
+
+
+def test_transform_rebuilds_after_interrupted_write(bronze_claims, capsys, monkeypatch):
+    """A transform interrupted mid-write is not taken as up to date by the next run."""
+    bronze_dir, silver_dir = bronze_claims
+    def interrupted_write(self, batch, *args, **kwargs):
+        raise KeyboardInterrupt
+    with monkeypatch.context() as patch:
+        patch.setattr(pq.ParquetWriter, "write_batch", interrupted_write)
+        with pytest.raises(KeyboardInterrupt):
+            _run(bronze_dir, silver_dir, capsys)
+    assert list(silver_dir.iterdir()) == []
+
+    assert "Transforming claims" in _run(bronze_dir, silver_dir, capsys)
+    assert len(pd.read_parquet(silver_dir / "claims.parquet")) == 5